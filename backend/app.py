@@ -1,13 +1,46 @@
 """FastAPI application with CORS and route includes."""
 
+import asyncio
 import os
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.routes import research, qa, results
+from core.bedrock import close_bedrock_client, get_bedrock_client
+from core.search_providers import close_search_client, get_search_client
+from backend.chat import chat_queue
+from backend.routes import metrics, research, qa, results
+from backend.state import sessions
 
-app = FastAPI(title="TravelAI API")
+SESSION_SWEEP_INTERVAL = int(os.environ.get("SESSION_SWEEP_INTERVAL", "60"))
+
+
+async def _sweep_sessions():
+    while True:
+        await asyncio.sleep(SESSION_SWEEP_INTERVAL)
+        await asyncio.to_thread(sessions.sweep)
+
+
+# The sweeper must not freeze or evict a session while chat turns for it are pending
+sessions.is_busy = chat_queue.depth
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build the shared Bedrock client once at startup instead of on the first request
+    get_bedrock_client()
+    get_search_client()
+    sweeper = asyncio.create_task(_sweep_sessions())
+    yield
+    sweeper.cancel()
+    with suppress(asyncio.CancelledError):
+        await sweeper
+    close_bedrock_client()
+    close_search_client()
+
+
+app = FastAPI(title="TravelAI API", lifespan=lifespan)
 
 # CORS: allow localhost dev + deployed Vercel frontend
 allowed_origins = [
@@ -28,6 +61,7 @@ app.add_middleware(
 app.include_router(research.router, prefix="/api")
 app.include_router(qa.router, prefix="/api")
 app.include_router(results.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 
 @app.get("/api/health")
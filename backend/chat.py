@@ -0,0 +1,120 @@
+"""Per-session chat queue: one Q&A turn at a time, identical questions answered once.
+
+Turns for a session run in arrival order, so each one sees the history the
+previous turn left behind. A question identical (ignoring case and
+whitespace) to one already queued or running for the same session joins
+that turn instead of starting another model run; every waiter gets the same
+answer, and streaming waiters receive the turn's events from the start.
+
+Serialization is per API process. With a shared SESSION_BACKEND, turns for
+one session sent to different processes are not ordered against each other.
+"""
+
+import asyncio
+import os
+
+CHAT_QUEUE_LIMIT = int(os.environ.get("CHAT_QUEUE_LIMIT", "8"))  # distinct turns waiting per session; more get 429
+
+
+class ChatQueueFull(Exception):
+    pass
+
+
+def question_key(question):
+    return " ".join(question.split()).casefold()
+
+
+class ChatTurn:
+    """A queued or running turn. Events are kept so late joiners can replay them."""
+
+    def __init__(self, loop, position):
+        self.loop = loop
+        self.position = position  # turns ahead of this one when it was queued
+        self.future = loop.create_future()
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())  # never "unretrieved"
+        self.events = []
+        self.listeners = []
+
+    def emit(self, event_type, data):
+        """Publish an event; safe to call from worker threads."""
+        self.loop.call_soon_threadsafe(self._publish, event_type, data)
+
+    def _publish(self, event_type, data):
+        self.events.append((event_type, data))
+        for listener in list(self.listeners):
+            listener((event_type, data))
+
+    def subscribe(self, listener):
+        """Call listener((event_type, data)) for past and future events. Returns an unsubscribe function."""
+        for event in self.events:
+            listener(event)
+        self.listeners.append(listener)
+        return lambda: self.listeners.remove(listener)
+
+    async def result(self):
+        # Shielded: a waiter that goes away does not cancel the turn for the others
+        return await asyncio.shield(self.future)
+
+
+class _SessionChat:
+    __slots__ = ("lock", "turns", "running")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: waiters acquire in arrival order
+        self.turns = {}             # question key -> ChatTurn, queued or running
+        self.running = 0
+
+
+class ChatQueue:
+    def __init__(self, limit=CHAT_QUEUE_LIMIT):
+        self.limit = limit
+        self._sessions = {}  # session_id -> _SessionChat with turns pending
+        self._tasks = set()
+
+    def submit(self, session_id, question, run):
+        """
+        Queue a turn, or join the identical one already pending. `run(emit)`
+        is a coroutine function producing the turn's result; it runs even if
+        every waiter disconnects. Returns (turn, shared).
+        Raises ChatQueueFull when the session already has `limit` turns pending.
+        """
+        state = self._sessions.setdefault(session_id, _SessionChat())
+        key = question_key(question)
+        turn = state.turns.get(key)
+        if turn is not None:
+            return turn, True
+        if len(state.turns) >= self.limit:
+            raise ChatQueueFull(session_id)
+        turn = state.turns[key] = ChatTurn(asyncio.get_running_loop(), len(state.turns))
+        task = asyncio.create_task(self._run(session_id, state, key, turn, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return turn, False
+
+    async def _run(self, session_id, state, key, turn, run):
+        try:
+            async with state.lock:
+                state.running += 1
+                try:
+                    turn.future.set_result(await run(turn.emit))
+                finally:
+                    state.running -= 1
+        except Exception as e:
+            turn.future.set_exception(e)
+        finally:
+            del state.turns[key]
+            if not state.turns:
+                self._sessions.pop(session_id, None)
+
+    def depth(self, session_id):
+        """Turns pending (queued or running) for a session."""
+        state = self._sessions.get(session_id)
+        return len(state.turns) if state else 0
+
+    def stats(self):
+        running = sum(state.running for state in self._sessions.values())
+        pending = sum(len(state.turns) for state in self._sessions.values())
+        return {"queued": pending - running, "running": running, "sessions": len(self._sessions)}
+
+
+chat_queue = ChatQueue()
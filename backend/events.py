@@ -0,0 +1,163 @@
+"""Append-only per-session event log with asyncio fan-out and replay."""
+
+from __future__ import annotations
+import asyncio
+import bisect
+import os
+import threading
+
+HEARTBEAT_SECONDS = 15.0
+EVENT_POLL_INTERVAL = float(os.environ.get("EVENT_POLL_INTERVAL", "0.25"))
+
+
+class EventLog:
+    """
+    Events are published from research threads and kept in order with
+    increasing integer ids. Any number of asyncio subscribers can read the log
+    from any point (SSE Last-Event-ID); they are woken on publish instead of
+    polling, and reading never removes events.
+    """
+
+    def __init__(self):
+        self._ids: list[int] = []
+        self._events: list[tuple[int, str, dict]] = []
+        self._next_id = 1
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+        self.closed = False
+
+    @classmethod
+    def from_events(cls, events, closed=False) -> EventLog:
+        """Rebuild a log from (id, event_type, data) tuples, e.g. when rehydrating a session."""
+        log = cls()
+        log._events = list(events)
+        log._ids = [e[0] for e in log._events]
+        log._next_id = (log._ids[-1] + 1) if log._ids else 1
+        log.closed = closed
+        return log
+
+    def publish(self, event_type: str, data: dict) -> int:
+        """Append an event and wake subscribers. Safe to call from any thread."""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            self._ids.append(event_id)
+            self._events.append((event_id, event_type, data))
+        self._wake()
+        return event_id
+
+    def close(self):
+        """Mark the log finished; subscribers return once they have caught up."""
+        with self._lock:
+            self.closed = True
+        self._wake()
+
+    def reopen(self):
+        """Accept events again after close(), e.g. when a finished session is re-researched."""
+        with self._lock:
+            self.closed = False
+
+    def since(self, last_id: int = 0) -> list[tuple[int, str, dict]]:
+        """Events with id greater than `last_id`."""
+        with self._lock:
+            return self._events[bisect.bisect_right(self._ids, last_id):]
+
+    def drop(self, predicate):
+        """Remove events matching predicate(event_type, data), e.g. superseded deltas. Ids are not reused."""
+        with self._lock:
+            kept = [e for e in self._events if not predicate(e[1], e[2])]
+            self._events = kept
+            self._ids = [e[0] for e in kept]
+
+    def discard(self, event_id):
+        """Remove the event with this id, if it is still in the log."""
+        with self._lock:
+            i = bisect.bisect_left(self._ids, event_id)
+            if i < len(self._ids) and self._ids[i] == event_id:
+                del self._ids[i], self._events[i]
+
+    @property
+    def last_id(self) -> int:
+        with self._lock:
+            return self._next_id - 1
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    async def subscribe(self, last_event_id: int = 0, heartbeat: float = HEARTBEAT_SECONDS):
+        """
+        Async generator of (id, event_type, data) starting after `last_event_id`.
+        Yields None when `heartbeat` seconds pass with no events.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.add(waiter)
+        cursor = last_event_id
+        try:
+            while True:
+                waiter[1].clear()
+                for event in self.since(cursor):
+                    cursor = event[0]
+                    yield event
+                if self.closed and not self.since(cursor):
+                    return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def _wake(self):
+        with self._lock:
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # subscriber's loop already closed
+
+
+class PolledEventLog:
+    """
+    Base for event logs kept in a shared store (SQLite, Redis) so that any
+    API worker can serve a session's stream. Subclasses implement publish,
+    since, close, reopen, drop, last_id and the `closed` property; subscribers poll
+    since() every EVENT_POLL_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self._subscribers = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return self._subscribers
+
+    async def subscribe(self, last_event_id: int = 0, heartbeat: float = HEARTBEAT_SECONDS):
+        """Same contract as EventLog.subscribe."""
+        self._subscribers += 1
+        cursor = last_event_id
+        idle = 0.0
+        try:
+            while True:
+                events = await asyncio.to_thread(self.since, cursor)
+                for event in events:
+                    cursor = event[0]
+                    yield event
+                if events:
+                    idle = 0.0
+                    continue
+                if await asyncio.to_thread(lambda: self.closed):
+                    if not await asyncio.to_thread(self.since, cursor):
+                        return
+                    continue
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
+                idle += EVENT_POLL_INTERVAL
+                if idle >= heartbeat:
+                    idle = 0.0
+                    yield None
+        finally:
+            self._subscribers -= 1
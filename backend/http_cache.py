@@ -0,0 +1,136 @@
+"""Cached, conditional and compressed responses for rendered session content.
+
+A rendered body is cached under a key that includes the session's
+results_version, so it is built once per change to the results and reused
+by every download until the next one. Each entry carries a strong ETag
+(a hash of the body) and its compressed variants, built on first request:
+
+- If-None-Match matching the ETag -> 304 with no body
+- Accept-Encoding negotiates br (optional `brotli` package), gzip or identity;
+  each encoding gets its own ETag suffix, and responses send Vary: Accept-Encoding
+- bodies are streamed in chunks with an exact Content-Length
+"""
+
+import asyncio
+import gzip
+import hashlib
+import os
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from core.cache import TTLCache
+from core.singleflight import SingleFlight
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+RENDER_CACHE_SIZE = int(os.environ.get("RENDER_CACHE_SIZE", "256"))
+RENDER_CACHE_TTL = int(os.environ.get("RENDER_CACHE_TTL", "3600"))
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+STREAM_CHUNK_BYTES = 64 * 1024
+
+# Memory only: entries hold bytes, and a new results_version makes old keys unreachable
+render_cache = TTLCache("render", RENDER_CACHE_SIZE, RENDER_CACHE_TTL)
+_render_flights = SingleFlight()
+
+_ENCODERS = {"gzip": lambda body: gzip.compress(body, compresslevel=6, mtime=0)}
+if brotli is not None:
+    _ENCODERS["br"] = lambda body: brotli.compress(body, quality=5)
+# Preference when the client accepts several encodings equally
+_PREFERENCE = ("br", "gzip")
+
+
+def negotiate_encoding(accept_encoding):
+    """The best encoding we support from an Accept-Encoding header, or "identity"."""
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    best, best_q = "identity", 0.0
+    for coding in _PREFERENCE:
+        if coding not in _ENCODERS:
+            continue
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in candidates
+
+
+def get_rendered(key, render):
+    """
+    The cache entry for `key`, calling render() -> str on a miss. Concurrent
+    misses for the same key render once. Blocking; call from a worker thread.
+    """
+    entry = render_cache.get(key)
+    if entry is not None:
+        return entry
+
+    def build():
+        body = render().encode("utf-8")
+        entry = {"body": body, "etag": hashlib.sha256(body).hexdigest()[:32], "encoded": {}}
+        render_cache.set(key, entry)
+        return entry
+
+    entry, _ = _render_flights.do(key, build)
+    return entry
+
+
+def _encoded(entry, encoding):
+    """(body, etag) for an encoding, compressing and keeping the variant on first use."""
+    if encoding == "identity" or len(entry["body"]) < COMPRESS_MIN_BYTES:
+        return entry["body"], f'"{entry["etag"]}"'
+    body = entry["encoded"].get(encoding)
+    if body is None:
+        body = entry["encoded"][encoding] = _ENCODERS[encoding](entry["body"])
+    return body, f'"{entry["etag"]}-{encoding}"'
+
+
+def _chunks(body):
+    view = memoryview(body)
+    for start in range(0, len(body), STREAM_CHUNK_BYTES):
+        yield bytes(view[start:start + STREAM_CHUNK_BYTES])
+
+
+async def cached_response(request: Request, key, render, media_type, headers=None):
+    """
+    Respond with the cached rendering of `key` (render() -> str on a miss),
+    honoring If-None-Match and Accept-Encoding.
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+    def prepare():
+        entry = get_rendered(key, render)
+        return entry, *_encoded(entry, encoding)
+
+    entry, body, etag = await asyncio.to_thread(prepare)
+    headers = {**(headers or {}), "ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if body is not entry["body"]:
+        headers["Content-Encoding"] = encoding
+    headers["Content-Length"] = str(len(body))
+    return StreamingResponse(_chunks(body), media_type=media_type, headers=headers)
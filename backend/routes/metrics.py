@@ -0,0 +1,57 @@
+"""Prometheus scrape endpoint."""
+
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core import metrics
+from core.digest import digest_cache
+from core.research import phase_cache
+from core.search import search_cache
+from backend.chat import chat_queue
+from backend.http_cache import render_cache
+from backend.runner import RESEARCH_WORKERS, scheduler
+from backend.state import sessions
+
+router = APIRouter()
+
+
+def _session_counts():
+    stats = sessions.stats()
+    return {(state,): stats.get(state) for state in ("sessions", "running", "queued", "cold")}
+
+
+def _research_queue():
+    if RESEARCH_WORKERS == "external":
+        return {("queued",): sessions.stats()["queued_jobs"]}
+    stats = scheduler.stats()
+    return {("queued",): stats["queued"], ("running",): stats["running"]}
+
+
+def _chat_queue():
+    stats = chat_queue.stats()
+    return {("queued",): stats["queued"], ("running",): stats["running"]}
+
+
+def _cache_stat(field):
+    def read():
+        return {(cache.name,): cache.stats()[field] for cache in (search_cache, phase_cache, digest_cache, render_cache)}
+    return read
+
+
+metrics.Gauge(
+    "travelai_sessions", "Sessions in the store by state (sessions = all)", ("state",), callback=_session_counts)
+metrics.Gauge(
+    "travelai_research_queue", "Research jobs waiting or running in this process", ("state",), callback=_research_queue)
+metrics.Gauge(
+    "travelai_chat_queue", "Chat turns waiting or running in this process", ("state",), callback=_chat_queue)
+metrics.Counter("travelai_cache_hits_total", "Cache hits", ("cache",), callback=_cache_stat("hits"))
+metrics.Counter("travelai_cache_misses_total", "Cache misses", ("cache",), callback=_cache_stat("misses"))
+metrics.Gauge("travelai_cache_entries", "Entries held in memory", ("cache",), callback=_cache_stat("size"))
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Gauge callbacks read the session store, which may do blocking I/O
+    return PlainTextResponse(await asyncio.to_thread(metrics.render), media_type="text/plain; version=0.0.4")
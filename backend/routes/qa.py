@@ -1,34 +1,122 @@
-"""Q&A chat endpoint."""
+"""Q&A chat endpoints: one JSON answer, or an SSE stream of search progress and answer text.
+
+Turns go through backend.chat.chat_queue, which runs them one at a time per
+session and coalesces identical pending questions.
+"""
 
 import asyncio
+import json
 
 from fastapi import APIRouter, HTTPException
+from sse_starlette.sse import EventSourceResponse
 
+from core import tracing
 from core.bedrock import get_bedrock_client
+from core.conversation import Conversation
 from core.models import ChatRequest
-from core.qa import run_qa_turn
-from backend.state import sessions
+from core.qa import arun_qa_turn
+from core.retrieval import get_research_index
+from backend.chat import ChatQueueFull, chat_queue
+from backend.state import aget_session, sessions
 
 router = APIRouter()
 
 
+async def _chat_session(session_id):
+    session = await aget_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.status != "complete":
+        raise HTTPException(status_code=400, detail="Research not yet complete")
+    return session
+
+
+async def _run_turn(session_id, question, on_event=None):
+    """Run one Q&A turn and persist the history. Returns (answer, usage)."""
+    # Loaded here, inside the queue, so the turn sees the history the previous turn saved
+    session = await aget_session(session_id)
+    conversation = Conversation(session.qa_messages, session.qa_summary)
+    # Usually cached since research completed, but a miss (e.g. another process finished it) builds BM25 off the loop
+    research_index = await asyncio.to_thread(get_research_index, session.results)
+    with tracing.session_span(session_id, "chat", "qa"):
+        answer = await arun_qa_turn(
+            get_bedrock_client(),
+            session.qa_system_prompt,
+            conversation,
+            question,
+            destination=session.prefs["destination"],
+            research_index=research_index,
+            on_event=on_event,
+        )
+    session.qa_summary = conversation.summary
+    await asyncio.to_thread(sessions.save, session, "qa_messages", "qa_summary")
+    return answer, conversation.last_usage
+
+
+async def _submit(session_id, question):
+    await _chat_session(session_id)
+    try:
+        return chat_queue.submit(session_id, question, lambda emit: _run_turn(session_id, question, emit))
+    except ChatQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many questions waiting for this session, please retry later",
+            headers={"Retry-After": "5"},
+        )
+
+
 @router.post("/research/{session_id}/chat")
 async def chat(session_id: str, req: ChatRequest):
-    if session_id not in sessions:
+    """
+    Answer a question. Turns for a session run one at a time in arrival
+    order; a question identical to one already pending shares its answer
+    (`shared`: true).
+    """
+    turn, shared = await _submit(session_id, req.question)
+    answer, usage = await turn.result()
+    return {"answer": answer, "usage": usage, "shared": shared}
+
+
+@router.get("/research/{session_id}/chat/queue")
+async def chat_queue_depth(session_id: str):
+    if not await asyncio.to_thread(sessions.__contains__, session_id):
         raise HTTPException(status_code=404, detail="Session not found")
+    return {"depth": chat_queue.depth(session_id), "limit": chat_queue.limit}
 
-    session = sessions[session_id]
-    if session.status != "complete":
-        raise HTTPException(status_code=400, detail="Research not yet complete")
 
-    bedrock_client = get_bedrock_client()
+@router.post("/research/{session_id}/chat/stream")
+async def chat_stream(session_id: str, req: ChatRequest):
+    """
+    SSE variant of /chat. Events: "queued" ({"position", "shared"}) when the
+    turn has to wait for earlier ones, "search" and "search_complete" as web
+    searches run, "answer_delta" ({"text", "iteration"}) as answer text is
+    generated (discard earlier text when the iteration changes), then
+    "answer" ({"answer", "usage", "shared"}) or "error".
+
+    The turn runs to completion even if the client disconnects, so the chat
+    history always holds whole question/answer pairs.
+    """
+    turn, shared = await _submit(session_id, req.question)
 
-    answer = await asyncio.to_thread(
-        run_qa_turn,
-        bedrock_client,
-        session.qa_system_prompt,
-        session.qa_messages,
-        req.question,
-    )
+    async def event_generator():
+        queue = asyncio.Queue()
+        unsubscribe = turn.subscribe(queue.put_nowait)
+        turn.future.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            if turn.position and not turn.future.done():
+                yield {"event": "queued", "data": json.dumps({"position": turn.position, "shared": shared})}
+            while (item := await queue.get()) is not None:
+                event_type, data = item
+                if event_type == "delta":
+                    event_type = "answer_delta"
+                yield {"event": event_type, "data": json.dumps(data)}
+        finally:
+            unsubscribe()
+        try:
+            answer, usage = turn.future.result()
+        except Exception as e:
+            yield {"event": "error", "data": json.dumps({"message": str(e)})}
+            return
+        yield {"event": "answer", "data": json.dumps({"answer": answer, "usage": usage, "shared": shared})}
 
-    return {"answer": answer}
+    return EventSourceResponse(event_generator())
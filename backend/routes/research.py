@@ -1,107 +1,125 @@
-"""Research endpoints: start research + SSE stream."""
+"""Research endpoints: start research + SSE stream + preference updates + trace."""
 
 import asyncio
 import json
-import threading
+import os
+import time
 import uuid
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Request
 from sse_starlette.sse import EventSourceResponse
 
-from core.bedrock import get_bedrock_client
-from core.models import TripPreferences
-from core.phases import PHASES
-from core.research import run_phase
-from core.qa import create_qa_system_prompt
-from backend.state import ResearchSession, sessions
+from core import tracing
+from core.models import TripPreferences, TripPreferencesUpdate
+from backend.runner import QueueFull, SessionBusy, submit_preferences_update, submit_research
+from backend.state import ResearchSession, aget_session, sessions
 
 router = APIRouter()
 
 
-def _run_research_thread(session: ResearchSession):
-    """Background thread: runs all 5 phases and pushes events to session.event_queue."""
-    q = session.event_queue
-    bedrock_client = get_bedrock_client()
-    total_searches = 0
+# Proxy addresses whose X-Forwarded-For is trusted for the client id used in queue fairness
+TRUSTED_PROXIES = {host.strip() for host in os.environ.get("TRUSTED_PROXIES", "").split(",") if host.strip()}
 
-    for i, phase in enumerate(PHASES):
-        phase_id = phase["id"]
 
-        q.put(("phase_start", {
-            "phase_id": phase_id,
-            "phase_index": i,
-            "title": phase["title"],
-        }))
-
-        def on_event(event_type, data, _pid=phase_id):
-            if event_type == "search":
-                q.put(("search", {
-                    "phase_id": _pid,
-                    "query": data["query"],
-                    "count": data["count"],
-                }))
-
-        try:
-            markdown, searches = run_phase(
-                bedrock_client, phase, session.prefs, session.results, on_event=on_event
-            )
-            with session.lock:
-                session.results[phase_id] = markdown
-                total_searches += searches
-                session.total_searches = total_searches
-
-            q.put(("phase_complete", {
-                "phase_id": phase_id,
-                "searches": searches,
-                "markdown": markdown,
-            }))
-        except Exception as e:
-            q.put(("phase_error", {
-                "phase_id": phase_id,
-                "error": str(e),
-            }))
-
-    # Build QA system prompt now that all results are ready
-    with session.lock:
-        session.qa_system_prompt = create_qa_system_prompt(session.prefs, session.results)
-        session.status = "complete"
-
-    q.put(("research_complete", {"total_searches": total_searches}))
+def _client_id(request: Request) -> str:
+    host = request.client.host if request.client else ""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and host in TRUSTED_PROXIES:
+        return forwarded.split(",")[-1].strip()
+    return host
 
 
 @router.post("/research")
-async def start_research(prefs: TripPreferences):
+async def start_research(prefs: TripPreferences, request: Request):
     session_id = uuid.uuid4().hex[:12]
     session = ResearchSession(
         session_id=session_id,
         prefs=prefs.model_dump(),
+        status="queued",
     )
-    sessions[session_id] = session
-
-    thread = threading.Thread(target=_run_research_thread, args=(session,), daemon=True)
-    thread.start()
+    # Store calls run on a worker thread; shared stores do blocking I/O
+    await asyncio.to_thread(sessions.__setitem__, session_id, session)
+    try:
+        position = await asyncio.to_thread(submit_research, session, _client_id(request))
+    except QueueFull as e:
+        await asyncio.to_thread(sessions.pop, session_id)
+        raise HTTPException(
+            status_code=429,
+            detail="Research queue is full, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+    return {"session_id": session_id, "queue_position": position}
+
+
+@router.patch("/research/{session_id}/preferences")
+async def update_preferences(session_id: str, update: TripPreferencesUpdate, request: Request):
+    """
+    Change some trip preferences and re-research only the phases they affect.
+    Progress arrives on the session's /stream (resume with ?after=stream_after).
+    """
+    session = await aget_session(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
 
-    return {"session_id": session_id}
+    prefs = TripPreferences(**{**session.prefs, **update.model_dump(exclude_unset=True, exclude_none=True)}).model_dump()
+    try:
+        return await asyncio.to_thread(submit_preferences_update, session, prefs, _client_id(request))
+    except SessionBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except QueueFull as e:
+        raise HTTPException(
+            status_code=429,
+            detail="Research queue is full, please retry later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
 
 @router.get("/research/{session_id}/stream")
-async def stream_research(session_id: str):
-    if session_id not in sessions:
+async def stream_research(
+    session_id: str,
+    last_event_id: int | None = Header(default=None),
+    after: int = 0,
+):
+    """
+    SSE stream of research events. Reconnecting clients resume from the
+    Last-Event-ID header (or ?after=<id>); earlier events are replayed.
+    """
+    session = await aget_session(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    session = sessions[session_id]
+    start_after = last_event_id if last_event_id is not None else after
 
     async def event_generator():
-        while True:
-            try:
-                event_type, data = await asyncio.to_thread(session.event_queue.get, timeout=1.0)
-                yield {"event": event_type, "data": json.dumps(data)}
-                if event_type == "research_complete":
-                    return
-            except Exception:
-                # queue.Empty — send heartbeat
-                if session.status in ("complete", "error"):
-                    return
-                yield {"event": "heartbeat", "data": ""}
+        trace = tracing.get_trace(session_id)
+        span = trace.record("sse", "sse", time.monotonic(), after=start_after) if trace else None
+        sent = 0
+        try:
+            async for event in session.events.subscribe(start_after):
+                if event is None:
+                    yield {"event": "heartbeat", "data": ""}
+                    continue
+                event_id, event_type, data = event
+                yield {"id": str(event_id), "event": event_type, "data": json.dumps(data)}
+                sent += 1
+        finally:
+            if span is not None:
+                span.set(events_sent=sent)
+                tracing.finish(span)
 
     return EventSourceResponse(event_generator())
+
+
+@router.get("/research/{session_id}/trace")
+async def get_trace(session_id: str):
+    """
+    Span timeline for a session (queue wait, phases, iterations, model and
+    tool calls, SSE connections) in Chrome trace format.
+    """
+    if not await asyncio.to_thread(sessions.__contains__, session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    trace = tracing.get_trace(session_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this session in this process")
+    return trace.to_chrome()
@@ -1,41 +1,87 @@
 """Results and download endpoints."""
 
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import PlainTextResponse
+import json
 
-from core.save import save_full_plan
-from backend.state import sessions
+from fastapi import APIRouter, HTTPException, Request
+
+from core.phases import PHASES
+from core.save import EXPORT_FORMATS, plan_filename, render_plan
+from backend.http_cache import cached_response
+from backend.state import aget_session
 
 router = APIRouter()
 
 
 @router.get("/research/{session_id}/results")
-async def get_results(session_id: str):
-    if session_id not in sessions:
+async def get_results(session_id: str, request: Request, since: int = 0, phases: str | None = None):
+    """
+    Session status and results. `version` increases whenever a phase result
+    changes; poll with ?since=<last version> to receive only the phases that
+    changed after it (plus `removed` for results dropped by a preference
+    update). ?phases=flights,hotels limits the response to those phases.
+    Supports ETag revalidation and gzip/br compression.
+    """
+    session = await aget_session(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
+    wanted = None
+    if phases:
+        wanted = {phase_id.strip() for phase_id in phases.split(",") if phase_id.strip()}
+        unknown = wanted - {phase["id"] for phase in PHASES}
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown phases: {', '.join(sorted(unknown))}")
+
+    with session.lock:
+        status, version, total_searches = session.status, session.results_version, session.total_searches
+        results, phase_versions, prefs = dict(session.results), dict(session.phase_versions), dict(session.prefs)
 
-    session = sessions[session_id]
-    return {
-        "status": session.status,
-        "results": session.results,
-        "total_searches": session.total_searches,
-        "prefs": session.prefs,
-    }
+    def render():
+        projected = {
+            phase_id: v for phase_id, v in phase_versions.items()
+            if wanted is None or phase_id in wanted
+        }
+        return json.dumps({
+            "status": status,
+            "version": version,
+            "results": {
+                phase_id: markdown for phase_id, markdown in results.items()
+                if (wanted is None or phase_id in wanted)
+                and (since == 0 or phase_versions.get(phase_id, 0) > since)
+            },
+            "removed": [
+                phase_id for phase_id, v in projected.items()
+                if since and v > since and phase_id not in results
+            ],
+            "phase_versions": {phase_id: v for phase_id, v in projected.items() if phase_id in results},
+            "total_searches": total_searches,
+            "prefs": prefs,
+        }, ensure_ascii=False)
+
+    key = f"{session_id}:results:{version}:{status}:{since}:{','.join(sorted(wanted or ()))}"
+    return await cached_response(request, key, render, "application/json")
 
 
 @router.get("/research/{session_id}/download")
-async def download_plan(session_id: str):
-    if session_id not in sessions:
+async def download_plan(session_id: str, request: Request, format: str = "md"):
+    """
+    The plan as markdown (default), json or html. Renders are cached per
+    results version and support ETag revalidation and gzip/br compression.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    session = await aget_session(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    session = sessions[session_id]
-    if not session.results:
+    with session.lock:
+        version, results, prefs = session.results_version, dict(session.results), dict(session.prefs)
+    if not results:
         raise HTTPException(status_code=400, detail="No results yet")
 
-    filename, content = save_full_plan(session.results, session.prefs)
-
-    return PlainTextResponse(
-        content=content,
-        media_type="text/markdown",
-        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    return await cached_response(
+        request,
+        f"{session_id}:{version}:{format}",
+        lambda: render_plan(results, prefs, format),
+        EXPORT_FORMATS[format][1],
+        {"Content-Disposition": f'attachment; filename="{plan_filename(prefs, format, version)}"'},
     )
@@ -0,0 +1,374 @@
+"""Research job execution, in-process or on separate worker processes."""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from core import tracing
+from core.bedrock import get_bedrock_client
+from core.digest import get_digest
+from core.phases import PHASES, affected_phases, get_phase
+from core.research import changed_fields, is_error_result, run_phase_cached
+from core.scheduler import run_phase_graph
+from core.qa import create_qa_system_prompt
+from core.retrieval import get_research_index
+from backend.state import SESSION_BACKEND, ResearchSession, sessions
+
+# "inline": run research on a thread in the API process.
+# "external": enqueue jobs for `python -m backend.worker` processes (needs a shared SESSION_BACKEND).
+RESEARCH_WORKERS = os.environ.get("RESEARCH_WORKERS", "inline")
+
+if RESEARCH_WORKERS == "external" and SESSION_BACKEND == "memory":
+    raise RuntimeError("RESEARCH_WORKERS=external requires SESSION_BACKEND=sqlite or redis")
+
+# Research sessions running at once in this process, and how many may wait behind them
+RESEARCH_MAX_CONCURRENT = int(os.environ.get("RESEARCH_MAX_CONCURRENT", "4"))
+RESEARCH_QUEUE_SIZE = int(os.environ.get("RESEARCH_QUEUE_SIZE", "32"))
+
+# Streamed phase text is published as one phase_delta per this many characters or milliseconds,
+# so shared stores see a write per batch rather than per model chunk
+PHASE_DELTA_BATCH_CHARS = int(os.environ.get("PHASE_DELTA_BATCH_CHARS", "200"))
+PHASE_DELTA_BATCH_MS = int(os.environ.get("PHASE_DELTA_BATCH_MS", "100"))
+
+
+class _DeltaBatcher:
+    """Joins a phase's streamed text chunks into phase_delta events of about PHASE_DELTA_BATCH_CHARS."""
+
+    def __init__(self, events, phase_id):
+        self.events = events
+        self.phase_id = phase_id
+        self.iteration = None
+        self.parts = []
+        self.size = 0
+        self.started = 0.0
+
+    def add(self, text, iteration):
+        if iteration != self.iteration:
+            self.flush()
+            self.iteration = iteration
+        if not self.parts:
+            self.started = time.monotonic()
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= PHASE_DELTA_BATCH_CHARS or time.monotonic() - self.started >= PHASE_DELTA_BATCH_MS / 1000:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.events.publish("phase_delta", {
+                "phase_id": self.phase_id, "text": "".join(self.parts), "iteration": self.iteration,
+            })
+            self.parts, self.size = [], 0
+
+
+class QueueFull(Exception):
+    """Raised when the research queue cannot take another job."""
+
+    def __init__(self, retry_after):
+        super().__init__("Research queue is full")
+        self.retry_after = retry_after
+
+
+class SessionBusy(Exception):
+    """Raised when a session's research is still queued or running."""
+
+
+def run_research(session: ResearchSession):
+    """
+    Runs every phase without a result yet (all 5 for a new session) as a
+    dependency graph and publishes events to session.events. Phases that
+    already have results are reused as context.
+    """
+    with tracing.session_span(session.session_id, "research", destination=session.prefs.get("destination")):
+        _run_research(session)
+
+
+def _run_research(session):
+    events = session.events
+    with session.lock:
+        session.status = "running"
+        sessions.save(session, "status")
+    bedrock_client = get_bedrock_client()
+    phase_index = {phase["id"]: i for i, phase in enumerate(PHASES)}
+    with session.lock:
+        pending_ids = {phase["id"] for phase in PHASES if phase["id"] not in session.results}
+    # Dependencies that already have results are satisfied
+    pending = [
+        {**phase, "depends_on": [dep for dep in phase["depends_on"] if dep in pending_ids]}
+        for phase in PHASES if phase["id"] in pending_ids
+    ]
+
+    def run_one(phase):
+        with tracing.span(phase["id"], "phase") as span:
+            run_phase_and_publish(phase, span)
+
+    def run_phase_and_publish(phase, span):
+        phase_id = phase["id"]
+
+        events.publish("phase_start", {
+            "phase_id": phase_id,
+            "phase_index": phase_index[phase_id],
+            "title": phase["title"],
+        })
+
+        deltas = _DeltaBatcher(events, phase_id)
+
+        def on_event(event_type, data):
+            if event_type != "delta":
+                deltas.flush()  # keep text before the search that follows it
+            if event_type == "search":
+                events.publish("search", {
+                    "phase_id": phase_id,
+                    "query": data["query"],
+                    "count": data["count"],
+                })
+            elif event_type == "search_complete":
+                events.publish("search_complete", {"phase_id": phase_id, **data})
+            elif event_type == "delta":
+                deltas.add(data["text"], data["iteration"])
+
+        with session.lock:
+            previous_results = {
+                dep: session.results[dep]
+                for dep in get_phase(phase_id)["depends_on"]
+                if dep in session.results
+            }
+
+        try:
+            markdown, searches, cached = run_phase_cached(
+                bedrock_client, phase, session.prefs, previous_results, on_event=on_event
+            )
+            if span is not None:
+                span.set(searches=searches, cached=cached)
+            with session.lock:
+                session.results[phase_id] = markdown
+                session.results_version += 1
+                session.phase_versions[phase_id] = session.results_version
+                # A cached result's searches ran for another session (or an earlier run)
+                session.total_searches += 0 if cached else searches
+                sessions.save(session, "results", "results_version", "phase_versions", "total_searches")
+
+            events.publish("phase_complete", {
+                "phase_id": phase_id,
+                "searches": searches,
+                "markdown": markdown,
+                "cached": cached,
+            })
+            # phase_complete carries the full markdown, so replays don't need the deltas
+            events.drop(lambda t, d: t == "phase_delta" and d["phase_id"] == phase_id)
+            if phase.get("digest") and not is_error_result(markdown):
+                # Extract the digest dependents use now, before they are started
+                get_digest(bedrock_client, phase, markdown)
+        except Exception as e:
+            events.publish("phase_error", {
+                "phase_id": phase_id,
+                "error": str(e),
+            })
+
+    run_phase_graph(pending, run_one)
+
+    # Build QA system prompt and retrieval index now that all results are ready
+    get_research_index(session.results)
+    with session.lock:
+        session.qa_system_prompt = create_qa_system_prompt(session.prefs, session.results)
+        session.status = "complete"
+        sessions.save(session, "qa_system_prompt", "status")
+
+    events.publish("research_complete", {"total_searches": session.total_searches})
+    events.close()
+
+
+class ResearchScheduler:
+    """
+    Bounded research job queue with a fixed pool of worker threads.
+
+    Jobs are queued per client and dequeued round-robin across clients, so
+    one client submitting a burst cannot starve the others. Waiting sessions
+    get "queued" events with their current position.
+    """
+
+    def __init__(self, max_concurrent=RESEARCH_MAX_CONCURRENT, max_queued=RESEARCH_QUEUE_SIZE):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self._queues = OrderedDict()  # client_id -> deque of sessions, in round-robin order
+        self._cond = threading.Condition()
+        self._running = 0
+        self._avg_seconds = 180.0     # moving average research duration, for Retry-After
+        self._threads = []
+        self._waits = {}              # session_id -> open "queued" trace span
+        self._positions = {}          # session_id -> last published queue position
+
+    def submit(self, session: ResearchSession, client_id: str) -> int:
+        """Queue a session. Returns its queue position (0 = starting now); raises QueueFull."""
+        moved = []
+        with self._cond:
+            if self._queued_count() >= self.max_queued:
+                raise QueueFull(self.retry_after())
+            self._start_workers()
+            session.status = "queued"
+            self._queues.setdefault(client_id, deque()).append(session)
+            trace = tracing.get_trace(session.session_id, create=True)
+            if trace is not None:
+                self._waits[session.session_id] = trace.record("queued", "queue", time.monotonic())
+            waiting = self._running + self._queued_count() > self.max_concurrent
+            if waiting:
+                moved = self._moved_positions()
+            self._cond.notify()
+            position = self._order().index(session) + 1 if waiting else 0
+        self._publish_positions(moved)
+        return position
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        return max(5, math.ceil(self._avg_seconds / max(1, self.max_concurrent)))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "running": self._running,
+                "queued": self._queued_count(),
+                "max_concurrent": self.max_concurrent,
+                "max_queued": self.max_queued,
+            }
+
+    def _queued_count(self):
+        return sum(len(q) for q in self._queues.values())
+
+    def _order(self):
+        """Queued sessions in the order they will be dequeued."""
+        queues = [list(q) for q in self._queues.values()]
+        order = []
+        for i in range(max((len(q) for q in queues), default=0)):
+            order.extend(q[i] for q in queues if i < len(q))
+        return order
+
+    def _moved_positions(self):
+        """(session, position, queued) for queued sessions whose position changed. Call with _cond held."""
+        queued = self._queued_count()
+        moved = []
+        for position, session in enumerate(self._order(), start=1):
+            if self._positions.get(session.session_id) != position:
+                self._positions[session.session_id] = position
+                moved.append((session, position, queued))
+        return moved
+
+    @staticmethod
+    def _publish_positions(moved):
+        """Publish "queued" events outside _cond; event logs may write to SQLite or Redis."""
+        for session, position, queued in moved:
+            session.events.publish("queued", {"position": position, "queued": queued})
+
+    def _start_workers(self):
+        while len(self._threads) < self.max_concurrent:
+            thread = threading.Thread(target=self._work_loop, daemon=True, name=f"research-{len(self._threads)}")
+            self._threads.append(thread)
+            thread.start()
+
+    def _work_loop(self):
+        while True:
+            with self._cond:
+                while not self._queues:
+                    self._cond.wait()
+                client_id, queue = next(iter(self._queues.items()))
+                session = queue.popleft()
+                del self._queues[client_id]
+                if queue:
+                    self._queues[client_id] = queue  # back of the round-robin order
+                self._running += 1
+                self._positions.pop(session.session_id, None)
+                moved = self._moved_positions()
+                tracing.finish(self._waits.pop(session.session_id, None))
+            self._publish_positions(moved)
+
+            started = time.monotonic()
+            try:
+                run_research(session)
+            except Exception as e:
+                session.status = "error"
+                sessions.save(session, "status")
+                session.events.publish("research_error", {"error": str(e)})
+                session.events.close()
+            finally:
+                with self._cond:
+                    self._running -= 1
+                    self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+
+
+scheduler = ResearchScheduler()
+
+
+def submit_research(session: ResearchSession, client_id: str = "") -> int:
+    """
+    Start research for a newly stored session. Returns the queue position
+    (0 = started right away). Raises QueueFull when the queue is at capacity.
+    """
+    if RESEARCH_WORKERS == "external":
+        if sessions.stats()["queued_jobs"] >= RESEARCH_QUEUE_SIZE:
+            raise QueueFull(scheduler.retry_after())
+        session.status = "queued"
+        sessions.save(session, "status")
+        sessions.enqueue_job(session.session_id)
+        return 0
+    return scheduler.submit(session, client_id)
+
+
+def submit_preferences_update(session: ResearchSession, prefs: dict, client_id: str = "") -> dict:
+    """
+    Apply new preferences to a finished session and re-research only the
+    phases they affect (core.phases.affected_phases); the other results are
+    kept. Progress is published on the session's existing event stream,
+    starting with a "preferences_updated" event.
+
+    Returns {"changed", "rerun", "reused", "queue_position", "stream_after"}.
+    Raises SessionBusy if research is still queued or running, and QueueFull
+    (leaving the session as it was) when the queue is at capacity.
+    """
+    with session.lock:
+        if session.status in ("queued", "running"):
+            raise SessionBusy("Research is still in progress for this session")
+        changed = changed_fields(session.prefs, prefs)
+        rerun = affected_phases(changed)
+        previous = (session.prefs, dict(session.results), session.status)
+        # Atomic in the store, so API processes sharing it cannot both start a re-run
+        if rerun and not sessions.try_mark_queued(session):
+            raise SessionBusy("Research is still in progress for this session")
+        if prefs != session.prefs or rerun:
+            session.prefs = prefs
+            session.results_version += 1
+        for phase_id in rerun:
+            if session.results.pop(phase_id, None) is not None:
+                session.phase_versions[phase_id] = session.results_version
+        sessions.save(session, "prefs", "results", "results_version", "phase_versions", "status")
+
+    summary = {
+        "changed": changed,
+        "rerun": rerun,
+        "reused": [phase["id"] for phase in PHASES if phase["id"] not in rerun],
+        "queue_position": 0,
+        "stream_after": session.events.last_id,
+    }
+    if not rerun:
+        return summary
+
+    session.events.reopen()
+    update_id = session.events.publish("preferences_updated", {
+        "changed": changed, "rerun": rerun, "reused": summary["reused"],
+    })
+    try:
+        summary["queue_position"] = submit_research(session, client_id)
+    except QueueFull:
+        session.events.discard(update_id)
+        session.events.close()
+        with session.lock:
+            # Versions only move forward, so the restored results get a new one
+            session.prefs, session.results, session.status = previous
+            session.results_version += 1
+            for phase_id in rerun:
+                if phase_id in session.results:
+                    session.phase_versions[phase_id] = session.results_version
+            sessions.save(session, "prefs", "results", "results_version", "phase_versions", "status")
+        raise
+    summary["stream_after"] = update_id - 1
+    return summary
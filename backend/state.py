@@ -1,23 +1,268 @@
-"""In-memory session store for research sessions."""
+"""Session store for research sessions.
+
+SESSION_BACKEND selects where sessions and their events live:
+"memory" (default, single process), "sqlite" (SESSION_DB file shared by
+every worker on the host) or "redis" (REDIS_URL, shared across hosts).
+"""
 
 from __future__ import annotations
-import queue
+import asyncio
+import json
+import os
 import threading
+import time
+import zlib
 from dataclasses import dataclass, field
 
+from backend.events import EventLog
+
+SESSION_IDLE_TTL = int(os.environ.get("SESSION_IDLE_TTL", str(24 * 3600)))
+SESSION_COLD_AFTER = int(os.environ.get("SESSION_COLD_AFTER", "600"))
+SESSION_MAX_BYTES = int(os.environ.get("SESSION_MAX_BYTES", str(512 * 1024 * 1024)))
+SESSION_SPILL_DIR = os.environ.get("SESSION_SPILL_DIR")  # unset = keep cold sessions compressed in memory
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "memory")
+SESSION_DB = os.environ.get("SESSION_DB", "sessions.sqlite3")
+REDIS_URL = os.environ.get("REDIS_URL", "redis://localhost:6379/0")
+# Jobs claimed longer ago than this are assumed orphaned by a dead worker and re-queued (shared backends)
+RESEARCH_JOB_TIMEOUT = int(os.environ.get("RESEARCH_JOB_TIMEOUT", "3600"))
+
+# Fields persisted by shared backends (everything except runtime-only state)
+RECORD_FIELDS = (
+    "session_id", "prefs", "results", "results_version", "phase_versions", "total_searches", "status",
+    "qa_system_prompt", "qa_messages", "qa_summary", "last_access",
+)
+
 
-@dataclass
+@dataclass(slots=True)
 class ResearchSession:
     session_id: str
     prefs: dict
     results: dict = field(default_factory=dict)       # phase_id -> markdown
+    results_version: int = 0                           # bumped whenever results or prefs change
+    phase_versions: dict = field(default_factory=dict) # phase_id -> results_version of its last change
     total_searches: int = 0
-    status: str = "running"                            # running | complete | error
-    event_queue: queue.Queue = field(default_factory=queue.Queue)
+    status: str = "running"                            # queued | running | complete | error
+    events: EventLog = field(default_factory=EventLog)
     qa_system_prompt: str = ""
-    qa_messages: list = field(default_factory=list)    # conversation history for Q&A
+    qa_messages: list = field(default_factory=list)    # recent Q&A turns, verbatim
+    qa_summary: str = ""                               # summary of older Q&A turns
     lock: threading.Lock = field(default_factory=threading.Lock)
+    last_access: float = field(default_factory=time.time)
+    cold: bytes | None = None                          # compressed payload while in the cold tier
+    spill_path: str | None = None                      # on-disk payload while spilled
+
+    def to_record(self, fields=RECORD_FIELDS) -> dict:
+        return {name: getattr(self, name) for name in fields}
+
+    @classmethod
+    def from_record(cls, record: dict, events) -> ResearchSession:
+        return cls(**{name: record[name] for name in RECORD_FIELDS if name in record}, events=events)
+
+    @property
+    def is_cold(self) -> bool:
+        return self.cold is not None or self.spill_path is not None
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by this session's payload."""
+        if self.cold is not None:
+            return len(self.cold)
+        if self.spill_path is not None:
+            return 0
+        size = len(self.qa_system_prompt) + len(self.qa_summary)
+        size += sum(len(text) for text in self.results.values())
+        size += sum(
+            len(block.get("text", ""))
+            for message in self.qa_messages
+            for block in message["content"]
+        )
+        size += sum(len(data.get("markdown", "")) + 64 for _, _, data in self.events.since(0))
+        return size
+
+    def freeze(self):
+        """
+        Move results, Q&A history and the event log into the compressed cold
+        tier. Call with self.lock held and no chat turn in flight; a running
+        turn keeps appending to the qa_messages list being replaced.
+        """
+        payload = zlib.compress(json.dumps({
+            "results": self.results,
+            "qa_system_prompt": self.qa_system_prompt,
+            "qa_messages": self.qa_messages,
+            "qa_summary": self.qa_summary,
+            "events": self.events.since(0),
+        }).encode(), 6)
+        if SESSION_SPILL_DIR:
+            os.makedirs(SESSION_SPILL_DIR, exist_ok=True)
+            self.spill_path = os.path.join(SESSION_SPILL_DIR, f"{self.session_id}.json.z")
+            with open(self.spill_path, "wb") as f:
+                f.write(payload)
+        else:
+            self.cold = payload
+        self.results = {}
+        self.qa_system_prompt = ""
+        self.qa_messages = []
+        self.qa_summary = ""
+        self.events = EventLog.from_events([], closed=True)
+
+    def thaw(self):
+        """Restore a cold session's payload into memory."""
+        if self.spill_path is not None:
+            with open(self.spill_path, "rb") as f:
+                payload = f.read()
+            os.remove(self.spill_path)
+            self.spill_path = None
+        else:
+            payload, self.cold = self.cold, None
+        data = json.loads(zlib.decompress(payload))
+        self.results = data["results"]
+        self.qa_system_prompt = data["qa_system_prompt"]
+        self.qa_messages = data["qa_messages"]
+        self.qa_summary = data["qa_summary"]
+        self.events = EventLog.from_events([tuple(e) for e in data["events"]], closed=True)
+
+    def discard(self):
+        if self.spill_path is not None and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+
+class SessionStore:
+    """
+    Dict-like session store with idle-TTL eviction, a memory cap and a cold
+    tier. Completed sessions idle for SESSION_COLD_AFTER seconds are
+    compressed (or spilled to SESSION_SPILL_DIR) and rehydrated on access.
+    Queued and running sessions, and sessions for which `is_busy(session_id)`
+    is true (the app sets it to the chat queue's depth), are never frozen or
+    evicted.
+    """
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, cold_after=SESSION_COLD_AFTER, max_bytes=SESSION_MAX_BYTES,
+                 is_busy=lambda session_id: False):
+        self.idle_ttl = idle_ttl
+        self.cold_after = cold_after
+        self.max_bytes = max_bytes
+        self.is_busy = is_busy
+        self._sessions: dict[str, ResearchSession] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._sessions
+
+    def __getitem__(self, session_id) -> ResearchSession:
+        with self._lock:
+            session = self._sessions[session_id]
+        with session.lock:
+            session.last_access = time.time()
+            if session.is_cold:
+                session.thaw()
+        return session
+
+    def __setitem__(self, session_id, session: ResearchSession):
+        with self._lock:
+            self._sessions[session_id] = session
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def get(self, session_id, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def save(self, session: ResearchSession, *fields):
+        """Persist changed fields. Sessions are live objects here, so nothing to do."""
+
+    def try_mark_queued(self, session: ResearchSession) -> bool:
+        """
+        Set status to "queued" unless research is already queued or running.
+        Sessions are live objects here, so session.lock (held by the caller)
+        makes this atomic.
+        """
+        if session.status in ("queued", "running"):
+            return False
+        session.status = "queued"
+        return True
+
+    def enqueue_job(self, session_id):
+        raise RuntimeError("The in-memory session store cannot hand jobs to other processes")
+
+    def pop(self, session_id, default=None):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            return default
+        session.discard()
+        return session
+
+    def sweep(self, now=None):
+        """Evict idle sessions, freeze cold ones, then enforce the memory cap. Returns stats()."""
+        now = now or time.time()
+        with self._lock:
+            candidates = [
+                s for s in self._sessions.values()
+                if s.status not in ("queued", "running") and not self.is_busy(s.session_id)
+            ]
+
+        for session in candidates:
+            idle = now - session.last_access
+            if idle > self.idle_ttl:
+                self.pop(session.session_id)
+            elif idle > self.cold_after and not session.is_cold and session.events.subscriber_count == 0:
+                with session.lock:
+                    # Re-checked under the lock: a chat turn may have been queued since
+                    if not session.is_cold and not self.is_busy(session.session_id):
+                        session.freeze()
+
+        # Over the cap: evict least recently used finished sessions
+        candidates.sort(key=lambda s: s.last_access)
+        total = self.total_bytes()
+        for session in candidates:
+            if total <= self.max_bytes:
+                break
+            if session.session_id in self:
+                total -= session.size_bytes()
+                self.pop(session.session_id)
+        return self.stats()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return sum(s.size_bytes() for s in sessions)
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "running": sum(1 for s in sessions if s.status == "running"),
+            "queued": sum(1 for s in sessions if s.status == "queued"),
+            "cold": sum(1 for s in sessions if s.is_cold),
+            "bytes": sum(s.size_bytes() for s in sessions),
+        }
+
+
+def _create_store():
+    if SESSION_BACKEND == "sqlite":
+        from backend.stores.sqlite import SQLiteSessionStore
+        return SQLiteSessionStore(SESSION_DB)
+    if SESSION_BACKEND == "redis":
+        from backend.stores.redis import RedisSessionStore
+        return RedisSessionStore(REDIS_URL)
+    if SESSION_BACKEND != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+    return SessionStore()
 
 
 # Global session store
-sessions: dict[str, ResearchSession] = {}
+sessions = _create_store()
+
+
+async def aget_session(session_id):
+    """
+    sessions.get(session_id) for async handlers, run on a worker thread:
+    shared stores do blocking database or network I/O, and cold sessions are
+    thawed from disk. Returns None when the session does not exist.
+    """
+    return await asyncio.to_thread(sessions.get, session_id)
@@ -0,0 +1 @@
+"""Shared session store backends for multi-worker deployments."""
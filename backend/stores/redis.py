@@ -0,0 +1,207 @@
+"""Redis-backed session store, event log and job queue.
+
+Works with Redis or any server speaking its protocol (Valkey, KeyDB,
+Dragonfly). Requires the optional `redis` package.
+"""
+
+from __future__ import annotations
+import json
+import time
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+from backend.events import PolledEventLog
+from backend.state import RECORD_FIELDS, RESEARCH_JOB_TIMEOUT, SESSION_IDLE_TTL, ResearchSession
+
+KEY_PREFIX = "travelai:"
+_JSON_FIELDS = {"prefs", "results", "phase_versions", "qa_messages"}
+
+
+class RedisEventLog(PolledEventLog):
+    """
+    A session's events in a sorted set scored by event id; ids come from an
+    INCR counter so they stay integers for SSE Last-Event-ID.
+    """
+
+    def __init__(self, store: RedisSessionStore, session_id: str):
+        super().__init__()
+        self._store = store
+        self._session_id = session_id
+        self._key = f"{KEY_PREFIX}events:{session_id}"
+
+    def publish(self, event_type: str, data: dict) -> int:
+        r = self._store.redis
+        event_id = r.incr(f"{self._key}:seq")
+        pipe = r.pipeline()
+        pipe.zadd(self._key, {json.dumps([event_id, event_type, data]): event_id})
+        self._store.touch(pipe, self._session_id)
+        pipe.execute()
+        return event_id
+
+    def since(self, last_id: int = 0):
+        members = self._store.redis.zrangebyscore(self._key, f"({last_id}", "+inf")
+        return [tuple(json.loads(m)) for m in members]
+
+    def drop(self, predicate):
+        doomed = [
+            json.dumps(list(e)) for e in self.since(0) if predicate(e[1], e[2])
+        ]
+        if doomed:
+            self._store.redis.zrem(self._key, *doomed)
+
+    def discard(self, event_id):
+        self._store.redis.zremrangebyscore(self._key, event_id, event_id)
+
+    def close(self):
+        pipe = self._store.redis.pipeline()
+        pipe.set(f"{self._key}:closed", 1)
+        self._store.touch(pipe, self._session_id)
+        pipe.execute()
+
+    def reopen(self):
+        self._store.redis.delete(f"{self._key}:closed")
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._store.redis.exists(f"{self._key}:closed"))
+
+    @property
+    def last_id(self) -> int:
+        return int(self._store.redis.get(f"{self._key}:seq") or 0)
+
+
+class RedisSessionStore:
+    """
+    Same interface as backend.state.SessionStore and SQLiteSessionStore.
+    Sessions are hashes of JSON-encoded fields; idle expiry uses Redis TTLs.
+    """
+
+    def __init__(self, url, idle_ttl=SESSION_IDLE_TTL):
+        if redis is None:
+            raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package (pip install redis)")
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.idle_ttl = idle_ttl
+
+    def _key(self, session_id):
+        return f"{KEY_PREFIX}session:{session_id}"
+
+    def _session_keys(self, session_id):
+        events_key = f"{KEY_PREFIX}events:{session_id}"
+        return self._key(session_id), events_key, f"{events_key}:seq", f"{events_key}:closed"
+
+    def touch(self, pipe, session_id):
+        """
+        Queue a TTL refresh of a session's hash and all of its event keys on
+        pipe, so they expire together; an event log that outlived its
+        session's reads would look open and empty, and restart its ids at 1.
+        """
+        for key in self._session_keys(session_id):
+            pipe.expire(key, self.idle_ttl)
+
+    def __contains__(self, session_id) -> bool:
+        return bool(self.redis.exists(self._key(session_id)))
+
+    def __getitem__(self, session_id) -> ResearchSession:
+        pipe = self.redis.pipeline()
+        pipe.hgetall(self._key(session_id))
+        self.touch(pipe, session_id)
+        raw = pipe.execute()[0]
+        if not raw:
+            raise KeyError(session_id)
+        record = {name: json.loads(value) for name, value in raw.items()}
+        record["last_access"] = time.time()
+        return ResearchSession.from_record(record, RedisEventLog(self, session_id))
+
+    def __setitem__(self, session_id, session: ResearchSession):
+        self.save(session)
+        session.events = RedisEventLog(self, session_id)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self.redis.scan_iter(f"{KEY_PREFIX}session:*"))
+
+    def get(self, session_id, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def save(self, session: ResearchSession, *fields):
+        record = session.to_record(fields or RECORD_FIELDS)
+        pipe = self.redis.pipeline()
+        pipe.hset(self._key(session.session_id), mapping={k: json.dumps(v) for k, v in record.items()})
+        self.touch(pipe, session.session_id)
+        pipe.execute()
+
+    def try_mark_queued(self, session: ResearchSession) -> bool:
+        """Atomically set status to "queued" unless another process already queued or started research."""
+        key = self._key(session.session_id)
+        with self.redis.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(key)
+                    status = pipe.hget(key, "status")
+                    if status is None or json.loads(status) in ("queued", "running"):
+                        return False
+                    pipe.multi()
+                    pipe.hset(key, "status", json.dumps("queued"))
+                    pipe.execute()
+                    session.status = "queued"
+                    return True
+                except redis.WatchError:
+                    continue
+
+    def pop(self, session_id, default=None):
+        session = self.get(session_id)
+        if session is None:
+            return default
+        self.redis.delete(*self._session_keys(session_id))
+        return session
+
+    def sweep(self, now=None):
+        """Redis expires idle keys itself."""
+        return self.stats()
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self),
+            "running": self.redis.hlen(f"{KEY_PREFIX}running"),
+            "cold": 0,
+            "queued_jobs": self.redis.llen(f"{KEY_PREFIX}jobs"),
+        }
+
+    # Job queue
+
+    def enqueue_job(self, session_id):
+        self.redis.rpush(f"{KEY_PREFIX}jobs", session_id)
+
+    def claim_job(self, worker_id, timeout=1):
+        """Block up to `timeout` seconds for the next job (orphaned ones first). Returns a session id or None."""
+        self._requeue_orphans()
+        item = self.redis.blpop([f"{KEY_PREFIX}jobs"], timeout=timeout)
+        if item is None:
+            return None
+        pipe = self.redis.pipeline()
+        pipe.hset(f"{KEY_PREFIX}running", item[1], worker_id)
+        pipe.zadd(f"{KEY_PREFIX}running:started", {item[1]: time.time()})
+        pipe.execute()
+        return item[1]
+
+    def finish_job(self, session_id):
+        pipe = self.redis.pipeline()
+        pipe.hdel(f"{KEY_PREFIX}running", session_id)
+        pipe.zrem(f"{KEY_PREFIX}running:started", session_id)
+        pipe.execute()
+
+    def _requeue_orphans(self):
+        """Put jobs claimed more than RESEARCH_JOB_TIMEOUT ago back at the front of the queue."""
+        started = f"{KEY_PREFIX}running:started"
+        for session_id in self.redis.zrangebyscore(started, "-inf", time.time() - RESEARCH_JOB_TIMEOUT):
+            # ZREM succeeds for one worker only, so an orphan is re-queued once
+            if self.redis.zrem(started, session_id):
+                pipe = self.redis.pipeline()
+                pipe.hdel(f"{KEY_PREFIX}running", session_id)
+                pipe.lpush(f"{KEY_PREFIX}jobs", session_id)
+                pipe.execute()
@@ -0,0 +1,281 @@
+"""SQLite-backed session store, event log and job queue.
+
+One database file shared by every uvicorn worker and `backend.worker`
+process on the host. Needs no outside services.
+"""
+
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+
+from backend.events import PolledEventLog
+from backend.state import RECORD_FIELDS, RESEARCH_JOB_TIMEOUT, SESSION_IDLE_TTL, ResearchSession
+
+_JSON_FIELDS = {"prefs", "results", "phase_versions", "qa_messages"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    prefs TEXT NOT NULL,
+    results TEXT NOT NULL,
+    results_version INTEGER NOT NULL DEFAULT 0,
+    phase_versions TEXT NOT NULL DEFAULT '{}',
+    total_searches INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    qa_system_prompt TEXT NOT NULL,
+    qa_messages TEXT NOT NULL,
+    qa_summary TEXT NOT NULL DEFAULT '',
+    last_access REAL NOT NULL,
+    events_closed INTEGER NOT NULL DEFAULT 0,
+    last_event_id INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS events (
+    session_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (session_id, id)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    session_id TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    worker TEXT,
+    enqueued_at REAL NOT NULL,
+    started_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (state, enqueued_at);
+"""
+
+# Columns added after the first release: (name, definition), for existing database files
+_ADDED_COLUMNS = [
+    ("qa_summary", "TEXT NOT NULL DEFAULT ''"),
+    ("results_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("phase_versions", "TEXT NOT NULL DEFAULT '{}'"),
+    ("last_event_id", "INTEGER NOT NULL DEFAULT 0"),
+]
+
+
+class SQLiteEventLog(PolledEventLog):
+    """A session's event log stored in the shared `events` table."""
+
+    def __init__(self, store: SQLiteSessionStore, session_id: str):
+        super().__init__()
+        self._store = store
+        self._session_id = session_id
+
+    def publish(self, event_type: str, data: dict) -> int:
+        # Ids come from the session's counter, not MAX(id), so dropping the newest event never frees its id.
+        # The MAX(id) term covers databases created before the counter existed.
+        max_id = "SELECT COALESCE(MAX(id), 0) FROM events WHERE session_id = ?"
+        with self._store.transaction() as db:
+            db.execute(
+                f"UPDATE sessions SET last_event_id = MAX(last_event_id, ({max_id})) + 1 WHERE session_id = ?",
+                (self._session_id, self._session_id),
+            )
+            row = db.execute("SELECT last_event_id FROM sessions WHERE session_id = ?", (self._session_id,)).fetchone()
+            event_id = row[0] if row is not None else db.execute(max_id, (self._session_id,)).fetchone()[0] + 1
+            db.execute(
+                "INSERT INTO events (session_id, id, type, data) VALUES (?, ?, ?, ?)",
+                (self._session_id, event_id, event_type, json.dumps(data)),
+            )
+        return event_id
+
+    def since(self, last_id: int = 0):
+        rows = self._store.db.execute(
+            "SELECT id, type, data FROM events WHERE session_id = ? AND id > ? ORDER BY id",
+            (self._session_id, last_id),
+        ).fetchall()
+        return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+    def drop(self, predicate):
+        doomed = [(self._session_id, e[0]) for e in self.since(0) if predicate(e[1], e[2])]
+        with self._store.transaction() as db:
+            db.executemany("DELETE FROM events WHERE session_id = ? AND id = ?", doomed)
+
+    def discard(self, event_id):
+        with self._store.transaction() as db:
+            db.execute("DELETE FROM events WHERE session_id = ? AND id = ?", (self._session_id, event_id))
+
+    def close(self):
+        with self._store.transaction() as db:
+            db.execute("UPDATE sessions SET events_closed = 1 WHERE session_id = ?", (self._session_id,))
+
+    def reopen(self):
+        with self._store.transaction() as db:
+            db.execute("UPDATE sessions SET events_closed = 0 WHERE session_id = ?", (self._session_id,))
+
+    @property
+    def closed(self) -> bool:
+        row = self._store.db.execute(
+            "SELECT events_closed FROM sessions WHERE session_id = ?", (self._session_id,)
+        ).fetchone()
+        return row is None or bool(row[0])
+
+    @property
+    def last_id(self) -> int:
+        (last,) = self._store.db.execute(
+            "SELECT MAX(COALESCE((SELECT last_event_id FROM sessions WHERE session_id = ?), 0), "
+            "(SELECT COALESCE(MAX(id), 0) FROM events WHERE session_id = ?))",
+            (self._session_id, self._session_id),
+        ).fetchone()
+        return last
+
+
+class _Transaction:
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+class SQLiteSessionStore:
+    """
+    Same interface as backend.state.SessionStore, but every read loads the
+    session from the database, so callers must save() the fields they change.
+    Also provides the research job queue used by `python -m backend.worker`.
+    """
+
+    def __init__(self, path, idle_ttl=SESSION_IDLE_TTL):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self.db.executescript(_SCHEMA)
+        existing = {row[1] for row in self.db.execute("PRAGMA table_info(sessions)")}
+        for name, definition in _ADDED_COLUMNS:
+            if name not in existing:
+                self.db.execute(f"ALTER TABLE sessions ADD COLUMN {name} {definition}")
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """Per-thread connection in autocommit mode."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def transaction(self):
+        return _Transaction(self.db)
+
+    def __contains__(self, session_id) -> bool:
+        return self.db.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def __getitem__(self, session_id) -> ResearchSession:
+        columns = ", ".join(RECORD_FIELDS)
+        row = self.db.execute(f"SELECT {columns} FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            raise KeyError(session_id)
+        record = {
+            name: json.loads(value) if name in _JSON_FIELDS else value
+            for name, value in zip(RECORD_FIELDS, row)
+        }
+        record["last_access"] = time.time()
+        self.db.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (record["last_access"], session_id))
+        return ResearchSession.from_record(record, SQLiteEventLog(self, session_id))
+
+    def __setitem__(self, session_id, session: ResearchSession):
+        record = self._encode(session.to_record())
+        columns = ", ".join(record)
+        placeholders = ", ".join("?" for _ in record)
+        with self.transaction() as db:
+            db.execute(f"INSERT OR REPLACE INTO sessions ({columns}) VALUES ({placeholders})", tuple(record.values()))
+            db.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+        session.events = SQLiteEventLog(self, session_id)
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def get(self, session_id, default=None):
+        try:
+            return self[session_id]
+        except KeyError:
+            return default
+
+    def save(self, session: ResearchSession, *fields):
+        """Write the given fields (all persisted fields when none are named)."""
+        record = self._encode(session.to_record(fields or RECORD_FIELDS))
+        assignments = ", ".join(f"{name} = ?" for name in record)
+        self.db.execute(
+            f"UPDATE sessions SET {assignments} WHERE session_id = ?",
+            (*record.values(), session.session_id),
+        )
+
+    def try_mark_queued(self, session: ResearchSession) -> bool:
+        """Atomically set status to "queued" unless another process already queued or started research."""
+        updated = self.db.execute(
+            "UPDATE sessions SET status = 'queued' WHERE session_id = ? AND status NOT IN ('queued', 'running')",
+            (session.session_id,),
+        ).rowcount
+        if updated:
+            session.status = "queued"
+        return bool(updated)
+
+    def pop(self, session_id, default=None):
+        session = self.get(session_id)
+        if session is None:
+            return default
+        with self.transaction() as db:
+            for table in ("sessions", "events", "jobs"):
+                db.execute(f"DELETE FROM {table} WHERE session_id = ?", (session_id,))
+        return session
+
+    def sweep(self, now=None):
+        """Delete finished sessions idle longer than the TTL. Returns stats()."""
+        cutoff = (now or time.time()) - self.idle_ttl
+        with self.transaction() as db:
+            expired = "SELECT session_id FROM sessions WHERE status NOT IN ('queued', 'running') AND last_access < ?"
+            for table in ("events", "jobs"):
+                db.execute(f"DELETE FROM {table} WHERE session_id IN ({expired})", (cutoff,))
+            db.execute("DELETE FROM sessions WHERE status NOT IN ('queued', 'running') AND last_access < ?", (cutoff,))
+        return self.stats()
+
+    def stats(self) -> dict:
+        total, running = self.db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(status = 'running'), 0) FROM sessions"
+        ).fetchone()
+        queued = self.db.execute("SELECT COUNT(*) FROM jobs WHERE state = 'queued'").fetchone()[0]
+        return {"sessions": total, "running": running, "cold": 0, "queued_jobs": queued}
+
+    # Job queue
+
+    def enqueue_job(self, session_id):
+        self.db.execute(
+            "INSERT OR REPLACE INTO jobs (session_id, state, enqueued_at) VALUES (?, 'queued', ?)",
+            (session_id, time.time()),
+        )
+
+    def claim_job(self, worker_id):
+        """Atomically take the oldest queued (or orphaned) job. Returns a session id or None."""
+        now = time.time()
+        with self.transaction() as db:
+            row = db.execute(
+                "SELECT session_id FROM jobs WHERE state = 'queued' OR (state = 'running' AND started_at < ?) "
+                "ORDER BY enqueued_at LIMIT 1",
+                (now - RESEARCH_JOB_TIMEOUT,),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET state = 'running', worker = ?, started_at = ? WHERE session_id = ?",
+                (worker_id, now, row[0]),
+            )
+        return row[0]
+
+    def finish_job(self, session_id):
+        self.db.execute("DELETE FROM jobs WHERE session_id = ?", (session_id,))
+
+    @staticmethod
+    def _encode(record: dict) -> dict:
+        return {
+            name: json.dumps(value) if name in _JSON_FIELDS else value
+            for name, value in record.items()
+        }
@@ -0,0 +1,53 @@
+"""Standalone research worker: `python -m backend.worker`.
+
+Claims research jobs from the shared session store and runs them, so
+research throughput scales with worker processes independently of the API
+processes serving /stream, /results and /chat. Requires
+RESEARCH_WORKERS=external on the API and SESSION_BACKEND=sqlite or redis.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+
+from backend.runner import run_research
+from backend.state import sessions
+
+RESEARCH_WORKER_THREADS = int(os.environ.get("RESEARCH_WORKER_THREADS", "4"))
+IDLE_POLL_SECONDS = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+def _work_loop(worker_id):
+    while True:
+        session_id = sessions.claim_job(worker_id)
+        if session_id is None:
+            time.sleep(IDLE_POLL_SECONDS)
+            continue
+        try:
+            run_research(sessions[session_id])
+        except Exception:
+            logger.exception("[%s] research %s failed", worker_id, session_id)
+        finally:
+            sessions.finish_job(session_id)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    base_id = f"{socket.gethostname()}:{os.getpid()}"
+    threads = [
+        threading.Thread(target=_work_loop, args=(f"{base_id}:{i}",), daemon=True)
+        for i in range(RESEARCH_WORKER_THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info("Research worker %s running %d job threads", base_id, len(threads))
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""End-to-end load benchmark: POST /research → SSE /stream → /chat, fully offline.
+
+Runs the API in-process on uvicorn against the fake Bedrock backend
+(core/fake_bedrock.py) and drives it over real HTTP. Reports:
+- sessions_per_sec: completed sessions (research + one chat turn) per second
+- phase_ms / chat_ms / first_event_ms: p50 and p99 latencies seen by the client
+- sse_events_per_sec: events delivered across all subscribers
+- fanout_lag_ms: spread between the first and last subscriber receiving an event
+- memory_per_session_kb: Python heap retained per finished session (tracemalloc)
+
+    python -m bench.loadtest --sessions 20 --subscribers 5
+    python -m bench.loadtest --save local        # write bench/baselines/local.json
+    python -m bench.loadtest --compare local     # exit 1 on a regression beyond --tolerance
+
+Fake model timing is set with --first-token-ms, --tokens-per-sec and
+--output-tokens (same distribution syntax as FAKE_BEDROCK_* in core/fake_bedrock.py).
+Web searches go to the fixture provider (core/search_providers.py) with
+--search-latency-ms; set SEARCH_HEDGE_MS to measure hedging.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+# metric -> True if higher is better
+METRICS = {
+    "sessions_per_sec": True,
+    "sse_events_per_sec": True,
+    "phase_ms_p50": False,
+    "phase_ms_p99": False,
+    "chat_ms_p50": False,
+    "chat_ms_p99": False,
+    "first_event_ms_p50": False,
+    "fanout_lag_ms_p50": False,
+    "fanout_lag_ms_p99": False,
+    "memory_per_session_kb": False,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+def start_server(app):
+    """Serve `app` on a free localhost port from a background thread. Returns (server, thread, base_url)."""
+    import uvicorn
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+async def read_sse(client, url, on_event):
+    """Consume an SSE stream, calling on_event(id, type, data, received_at) until research ends."""
+    async with client.stream("GET", url) as response:
+        event = {}
+        async for line in response.aiter_lines():
+            if line:
+                field, _, value = line.partition(":")
+                event[field] = value.strip()
+                continue
+            if event.get("event") and event["event"] != "heartbeat":
+                data = json.loads(event.get("data") or "{}")
+                on_event(int(event.get("id", 0)), event["event"], data, time.monotonic())
+                if event["event"] in ("research_complete", "research_error"):
+                    return
+            event = {}
+
+
+async def run_session(client, index, args, stats):
+    prefs = {"destination": f"Bench City {index}" if not args.shared_prefs else "Bench City", "days": args.days}
+    started = time.monotonic()
+    while True:
+        response = await client.post("/api/research", json=prefs)
+        if response.status_code != 429:
+            break
+        stats["rejected"] += 1
+        await asyncio.sleep(int(response.headers.get("Retry-After", "1")))
+    response.raise_for_status()
+    session_id = response.json()["session_id"]
+
+    arrivals = {}      # event id -> [received_at per subscriber]
+    phase_started = {}
+    first_event = []
+
+    def on_event(subscriber, event_id, event_type, data, received_at):
+        stats["events"] += 1
+        arrivals.setdefault(event_id, []).append(received_at)
+        if subscriber:
+            return
+        if not first_event:
+            first_event.append(received_at)
+            stats["first_event_ms"].append((received_at - started) * 1000)
+        if event_type == "phase_start":
+            phase_started[data["phase_id"]] = received_at
+        elif event_type == "phase_complete" and data["phase_id"] in phase_started:
+            stats["phase_ms"].append((received_at - phase_started[data["phase_id"]]) * 1000)
+
+    url = f"/api/research/{session_id}/stream"
+    await asyncio.gather(*(
+        read_sse(client, url, lambda *event, s=s: on_event(s, *event))
+        for s in range(args.subscribers)
+    ))
+    for times in arrivals.values():
+        if len(times) == args.subscribers > 1:
+            stats["fanout_lag_ms"].append((max(times) - min(times)) * 1000)
+
+    chat_started = time.monotonic()
+    response = await client.post(f"/api/research/{session_id}/chat", json={"question": args.question})
+    response.raise_for_status()
+    stats["chat_ms"].append((time.monotonic() - chat_started) * 1000)
+
+
+async def run_load(base_url, args):
+    import httpx
+
+    stats = {"events": 0, "rejected": 0, "phase_ms": [], "chat_ms": [], "first_event_ms": [], "fanout_lag_ms": []}
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        started = time.monotonic()
+        await asyncio.gather(*(run_session(client, i, args, stats) for i in range(args.sessions)))
+        elapsed = time.monotonic() - started
+    return stats, elapsed
+
+
+def run(args):
+    os.environ.setdefault("BEDROCK_BACKEND", "fake")
+    os.environ["FAKE_BEDROCK_FIRST_TOKEN_MS"] = args.first_token_ms
+    os.environ["FAKE_BEDROCK_TOKENS_PER_SEC"] = args.tokens_per_sec
+    os.environ["FAKE_BEDROCK_OUTPUT_TOKENS"] = args.output_tokens
+    os.environ.setdefault("FAKE_BEDROCK_SEED", "1")
+    os.environ.setdefault("SEARCH_BACKEND", "fixture")
+    os.environ["SEARCH_FIXTURE_LATENCY_MS"] = args.search_latency_ms
+    os.environ.setdefault("RESEARCH_QUEUE_SIZE", str(max(32, args.sessions)))
+
+    tracemalloc.start()
+    from backend.app import app
+    from backend.state import sessions
+
+    server, thread, base_url = start_server(app)
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+    try:
+        stats, elapsed = asyncio.run(run_load(base_url, args))
+        retained = tracemalloc.get_traced_memory()[0] - baseline_memory
+        session_bytes = sessions.stats().get("bytes")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+        tracemalloc.stop()
+
+    results = {
+        "sessions_per_sec": args.sessions / elapsed,
+        "sse_events_per_sec": stats["events"] / elapsed,
+        "memory_per_session_kb": retained / args.sessions / 1024,
+        "session_payload_kb": (session_bytes or 0) / args.sessions / 1024,
+        "elapsed_sec": elapsed,
+        "rejected_429": stats["rejected"],
+    }
+    for name in ("phase_ms", "chat_ms", "first_event_ms", "fanout_lag_ms"):
+        results[f"{name}_p50"] = percentile(stats[name], 50)
+        results[f"{name}_p99"] = percentile(stats[name], 99)
+        results[f"{name}_mean"] = statistics.fmean(stats[name]) if stats[name] else 0.0
+    return {name: round(value, 3) for name, value in results.items()}
+
+
+def compare(results, baseline, tolerance):
+    """Print each tracked metric against the baseline. Returns the names that regressed."""
+    regressed = []
+    print(f"{'metric':<24}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, higher_is_better in METRICS.items():
+        old, new = baseline.get(name), results.get(name)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = ""
+        if worse > tolerance:
+            regressed.append(name)
+            flag = "  REGRESSED"
+        print(f"{name:<24}{old:>12.3f}{new:>12.3f}{change:>+10.1%}{flag}")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="research sessions to run concurrently")
+    parser.add_argument("--subscribers", type=int, default=3, help="SSE subscribers per session")
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--question", default="Which neighborhood should we stay in?")
+    parser.add_argument("--shared-prefs", action="store_true", help="same trip for every session (phase cache hits)")
+    parser.add_argument("--first-token-ms", default="lognormal:400,1500")
+    parser.add_argument("--tokens-per-sec", default="uniform:300,600")
+    parser.add_argument("--output-tokens", default="lognormal:400,1200")
+    parser.add_argument("--search-latency-ms", default="lognormal:300,1500", help="fixture search provider latency")
+    parser.add_argument("--save", metavar="NAME", help="save results as bench/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against bench/baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    config = {k: v for k, v in vars(args).items() if k not in ("save", "compare", "tolerance")}
+    print(json.dumps({"config": config, "results": results}, indent=2))
+
+    if args.save:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save}.json"
+        path.write_text(json.dumps({"config": config, "results": results}, indent=2) + "\n")
+        print(f"Saved baseline to {path}")
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        if baseline["config"] != config:
+            print("Warning: baseline was recorded with a different configuration", file=sys.stderr)
+        if compare(results, baseline["results"], args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
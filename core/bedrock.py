@@ -1,27 +1,154 @@
 """AWS Bedrock client and Converse API helpers."""
 
+import asyncio
+import functools
+import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 from botocore.config import Config
 
+from core import metrics, tracing
+from core.governor import estimate_request_tokens, governor
+from core.routing import BEDROCK_MODEL_ID
+
 AWS_REGION = os.environ.get("AWS_BEDROCK_REGION", "us-east-1")
-MODEL_ID = "us.anthropic.claude-opus-4-6-v1"
+# Default model; per-call models come from core.routing
+MODEL_ID = BEDROCK_MODEL_ID
+
+# Stream phase output token-by-token when someone is listening for events
+BEDROCK_STREAMING = os.environ.get("BEDROCK_STREAMING", "1") == "1"
+
+# Sized for concurrent phases across sessions plus in-flight chat turns.
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+
+# Add Converse cachePoint blocks so repeated prompt prefixes are served from Bedrock's prompt cache
+BEDROCK_PROMPT_CACHE = os.environ.get("BEDROCK_PROMPT_CACHE", "1") == "1"
+
+# "aws" for Bedrock, "fake" for the offline stand-in in core.fake_bedrock,
+# "record" for Bedrock with every call saved for fake replay (BEDROCK_RECORD_PATH)
+BEDROCK_BACKEND = os.environ.get("BEDROCK_BACKEND", "aws")
+
+CACHE_POINT = {"cachePoint": {"type": "default"}}
+
+_client = None
+_executor = None
+_client_lock = threading.Lock()
 
 
 def get_bedrock_client():
-    """Create a Bedrock Runtime client."""
-    return boto3.client(
-        service_name="bedrock-runtime",
-        region_name=AWS_REGION,
-        config=Config(read_timeout=180, retries={"max_attempts": 2}),
-    )
+    """
+    Return the process-wide Bedrock Runtime client, creating it on first use.
+    boto3 clients are thread-safe, so every research thread and chat turn
+    shares one service model, credential chain and keep-alive connection pool.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None and BEDROCK_BACKEND == "fake":
+                from core.fake_bedrock import FakeBedrockClient
+                _client = FakeBedrockClient.from_env()
+            elif _client is None:
+                client = boto3.session.Session().client(
+                    service_name="bedrock-runtime",
+                    region_name=AWS_REGION,
+                    config=Config(
+                        read_timeout=180,
+                        # Retries and backoff are handled by core.governor
+                        retries={"mode": "standard", "max_attempts": 1},
+                        max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+                        tcp_keepalive=True,
+                    ),
+                )
+                if BEDROCK_BACKEND == "record":
+                    from core.fake_bedrock import RecordingBedrockClient
+                    client = RecordingBedrockClient(client)
+                _client = client
+    return _client
+
+
+def _get_executor():
+    """Dedicated executor for async Bedrock calls (keeps the default executor free)."""
+    global _executor
+    if _executor is None:
+        with _client_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=BEDROCK_MAX_POOL_CONNECTIONS, thread_name_prefix="bedrock"
+                )
+    return _executor
+
+
+def close_bedrock_client():
+    """Release the shared client and its connection pool (app shutdown)."""
+    global _client, _executor
+    with _client_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def add_cache_points(system_prompt, messages):
+    """
+    Return (system_blocks, messages) with cachePoint blocks after the system
+    prompt, after the first user message (trip context / conversation start)
+    and after the last message, so the next agent-loop iteration reads the
+    whole current prompt from cache. Bedrock allows at most 4 cache points.
+    Messages that get a cache point are copied; the caller's list is untouched.
+    """
+    system = [{"text": system_prompt}, CACHE_POINT]
+    if not messages:
+        return system, messages
+    marked = list(messages)
+    for i in sorted({0, len(marked) - 1}):
+        marked[i] = {**marked[i], "content": [*marked[i]["content"], CACHE_POINT]}
+    return system, marked
+
+
+def _observe_call(purpose, model, started, response=None, span=None):
+    """Record a Converse call's outcome, latency and token usage in core.metrics and its trace span."""
+    labels = {"model": model, "purpose": purpose}
+    metrics.LLM_REQUESTS.inc(status="ok" if response is not None else "error", **labels)
+    metrics.LLM_LATENCY.observe(time.monotonic() - started, **labels)
+    if response is None:
+        return
+    latency_ms = response.get("metrics", {}).get("latencyMs")
+    if latency_ms is not None:
+        metrics.LLM_SERVER_LATENCY.observe(latency_ms / 1000, **labels)
+    usage = response.get("usage", {})
+    if span is not None:
+        span.set(
+            stop_reason=response.get("stopReason"),
+            input_tokens=usage.get("inputTokens", 0),
+            output_tokens=usage.get("outputTokens", 0),
+            cache_read_tokens=usage.get("cacheReadInputTokens", 0),
+            cache_write_tokens=usage.get("cacheWriteInputTokens", 0),
+            server_latency_ms=latency_ms,
+        )
+    for kind, field in (
+        ("input", "inputTokens"),
+        ("output", "outputTokens"),
+        ("cache_read", "cacheReadInputTokens"),
+        ("cache_write", "cacheWriteInputTokens"),
+    ):
+        if usage.get(field):
+            metrics.LLM_TOKENS.inc(usage[field], kind=kind, **labels)
 
 
-def call_bedrock_converse(client, system_prompt, messages, tools=None, max_tokens=8000):
-    """Call Claude via Bedrock Converse API."""
+def _converse_kwargs(model, system_prompt, messages, tools, max_tokens):
+    if BEDROCK_PROMPT_CACHE:
+        system, messages = add_cache_points(system_prompt, messages)
+    else:
+        system = [{"text": system_prompt}]
     kwargs = {
-        "modelId": MODEL_ID,
-        "system": [{"text": system_prompt}],
+        "modelId": model,
+        "system": system,
         "messages": messages,
         "inferenceConfig": {
             "maxTokens": max_tokens,
@@ -30,8 +157,136 @@ def call_bedrock_converse(client, system_prompt, messages, tools=None, max_token
     }
     if tools:
         kwargs["toolConfig"] = {"tools": tools}
+    return kwargs
 
-    return client.converse(**kwargs)
+
+def call_bedrock_converse(
+    client, system_prompt, messages, tools=None, max_tokens=8000, purpose="other", model=None
+):
+    """
+    Call Claude via Bedrock Converse API. `purpose` (a phase id, "qa", ...)
+    labels the call in core.metrics and sets its priority in core.governor.
+    `model` (see core.routing) defaults to MODEL_ID.
+    """
+    model = model or MODEL_ID
+    with tracing.span("converse", "model", purpose=purpose, model=model) as span:
+        started = time.monotonic()
+        try:
+            kwargs = _converse_kwargs(model, system_prompt, messages, tools, max_tokens)
+            response = governor.call(
+                lambda: client.converse(**kwargs), purpose, estimate_request_tokens(kwargs), max_tokens
+            )
+        except Exception:
+            _observe_call(purpose, model, started)
+            raise
+        _observe_call(purpose, model, started, response, span)
+    return response
+
+
+def call_bedrock_converse_stream(
+    client, system_prompt, messages, tools=None, max_tokens=8000, on_text=None, purpose="other", model=None
+):
+    """
+    Call Claude via Bedrock ConverseStream API, calling on_text(delta) as text arrives.
+    Tool-use input deltas are reassembled, and the return value has the same
+    shape as a Converse response, so the helpers below work on either.
+    """
+    model = model or MODEL_ID
+    with tracing.span("converse_stream", "model", purpose=purpose, model=model) as span:
+        started = time.monotonic()
+        streamed = []  # set once text has reached on_text; such a stream cannot be retried
+
+        def forward(text):
+            if not streamed:
+                streamed.append(True)
+            if on_text:
+                on_text(text)
+
+        try:
+            kwargs = _converse_kwargs(model, system_prompt, messages, tools, max_tokens)
+            result = governor.call(
+                lambda: _read_stream(client.converse_stream(**kwargs), forward),
+                purpose, estimate_request_tokens(kwargs), max_tokens,
+                retryable=lambda: not streamed,
+            )
+        except Exception:
+            _observe_call(purpose, model, started)
+            raise
+        _observe_call(purpose, model, started, result, span)
+    return result
+
+
+def _read_stream(response, on_text):
+    """Reassemble ConverseStream events into a Converse-shaped response."""
+    blocks = {}  # contentBlockIndex -> {"text": [chunks]} | {"toolUse": {..., "input": [chunks]}}
+    result = {"stopReason": "end_turn"}
+    for event in response["stream"]:
+        if "contentBlockStart" in event:
+            start = event["contentBlockStart"]
+            tool = start.get("start", {}).get("toolUse")
+            if tool:
+                blocks[start["contentBlockIndex"]] = {"toolUse": {
+                    "toolUseId": tool["toolUseId"],
+                    "name": tool["name"],
+                    "input": [],
+                }}
+        elif "contentBlockDelta" in event:
+            delta = event["contentBlockDelta"]
+            index = delta["contentBlockIndex"]
+            if "text" in delta["delta"]:
+                blocks.setdefault(index, {"text": []})["text"].append(delta["delta"]["text"])
+                if on_text:
+                    on_text(delta["delta"]["text"])
+            elif "toolUse" in delta["delta"]:
+                blocks[index]["toolUse"]["input"].append(delta["delta"]["toolUse"].get("input", ""))
+        elif "messageStop" in event:
+            result["stopReason"] = event["messageStop"].get("stopReason", "end_turn")
+        elif "metadata" in event:
+            result["usage"] = event["metadata"].get("usage", {})
+            result["metrics"] = event["metadata"].get("metrics", {})
+
+    content = []
+    for index in sorted(blocks):
+        block = blocks[index]
+        if "text" in block:
+            content.append({"text": "".join(block["text"])})
+        else:
+            raw_input = "".join(block["toolUse"]["input"])
+            content.append({"toolUse": {**block["toolUse"], "input": json.loads(raw_input) if raw_input else {}}})
+
+    result["output"] = {"message": {"role": "assistant", "content": content}}
+    return result
+
+
+async def acall_bedrock_converse(
+    client, system_prompt, messages, tools=None, max_tokens=8000, purpose="other", model=None
+):
+    """Async variant of call_bedrock_converse; only holds a thread for the HTTP call itself."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        tracing.bind(functools.partial(
+            call_bedrock_converse, client, system_prompt, messages,
+            tools=tools, max_tokens=max_tokens, purpose=purpose, model=model,
+        )),
+    )
+
+
+async def acall_bedrock_converse_stream(
+    client, system_prompt, messages, tools=None, max_tokens=8000, on_text=None, purpose="other", model=None
+):
+    """
+    Async variant of call_bedrock_converse_stream. on_text is called from the
+    worker thread reading the stream.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_executor(),
+        tracing.bind(functools.partial(
+            call_bedrock_converse_stream, client, system_prompt, messages,
+            tools=tools, max_tokens=max_tokens, on_text=on_text, purpose=purpose, model=model,
+        )),
+    )
 
 
 def extract_text_from_response(response):
@@ -0,0 +1,126 @@
+"""Thread-safe LRU cache with TTL expiry and an optional SQLite tier."""
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    In-memory LRU cache of JSON-serializable values with per-entry TTL.
+
+    When `db_path` is set, entries are also written to a SQLite table so they
+    survive restarts and can be shared by several processes. A memory miss
+    falls through to SQLite and promotes the entry back into memory. Expired
+    rows are purged from SQLite on open and every `purge_every` sets.
+    """
+
+    def __init__(self, name, max_entries=1024, ttl_seconds=86400, db_path=None, purge_every=256):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self._sets_since_purge = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS cache_{name} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.purge_expired()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires_at FROM cache_{self.name} WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] > now:
+                    value = json.loads(row[0])
+                    self._store(key, value, row[1])
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return value
+                if row:
+                    self._db.execute(f"DELETE FROM cache_{self.name} WHERE key = ?", (key,))
+
+            self._misses += 1
+            return None
+
+    def set(self, key, value, ttl_seconds=None):
+        """Store a value; `ttl_seconds` overrides the cache default."""
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        with self._lock:
+            self._store(key, value, expires_at)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO cache_{self.name} (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._sets_since_purge += 1
+                if self._sets_since_purge >= self.purge_every:
+                    self._purge_expired()
+
+    def purge_expired(self):
+        """Delete expired SQLite rows. Returns how many were removed."""
+        with self._lock:
+            return self._purge_expired()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM cache_{self.name} WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM cache_{self.name}")
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+            }
+
+    def _purge_expired(self):
+        # Caller holds self._lock
+        self._sets_since_purge = 0
+        if self._db is None:
+            return 0
+        return self._db.execute(f"DELETE FROM cache_{self.name} WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def _store(self, key, value, expires_at):
+        # Caller holds self._lock
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
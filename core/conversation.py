@@ -0,0 +1,76 @@
+"""Token-budgeted Q&A history: recent turns verbatim, older turns summarized."""
+
+import os
+
+from core.bedrock import acall_bedrock_converse, extract_text_from_response
+from core.routing import router
+from core.util import estimate_tokens
+
+# Budget for the conversation history sent with each Q&A request (estimated tokens)
+QA_HISTORY_TOKEN_BUDGET = int(os.environ.get("QA_HISTORY_TOKEN_BUDGET", "4000"))
+# Question/answer pairs always kept verbatim
+QA_KEEP_RECENT_TURNS = int(os.environ.get("QA_KEEP_RECENT_TURNS", "3"))
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a conversation between a traveler and a travel assistant.
+Merge the new exchanges into the existing summary. Keep every concrete fact, decision,
+preference, name, price and link the traveler may refer back to. Drop pleasantries.
+Reply with the updated summary only, under 300 words."""
+
+
+def message_text(message):
+    return "\n".join(block["text"] for block in message["content"] if "text" in block)
+
+
+class Conversation:
+    """
+    Q&A history for one session. `messages` is the verbatim tail (alternating
+    user/assistant text messages) and `summary` covers everything older.
+    Both are mutated in place, so pass in the session's own list.
+    """
+
+    def __init__(self, messages, summary="", token_budget=QA_HISTORY_TOKEN_BUDGET, keep_recent=QA_KEEP_RECENT_TURNS):
+        self.messages = messages
+        self.summary = summary
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.last_usage = {}
+
+    def history_tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(message_text(m)) for m in self.messages)
+
+    def system_prompt(self, base_prompt):
+        """The base Q&A system prompt plus the summary of older turns."""
+        if not self.summary:
+            return base_prompt
+        return f"{base_prompt}\n\nEarlier in this conversation (summary):\n{self.summary}"
+
+    def record_turn(self, question, answer):
+        self.messages.append({"role": "user", "content": [{"text": question}]})
+        self.messages.append({"role": "assistant", "content": [{"text": answer}]})
+
+    async def compact(self, bedrock_client):
+        """
+        While over budget, fold the oldest turns beyond the recent window into
+        the summary with one model call. Returns the number of turns folded.
+        Falls back to a truncated plain-text summary if the call fails.
+        """
+        folded = []
+        while self.history_tokens() > self.token_budget and len(self.messages) > 2 * self.keep_recent:
+            folded.extend(self.messages[:2])
+            del self.messages[:2]
+        if not folded:
+            return 0
+
+        transcript = "\n\n".join(f"{m['role'].upper()}: {message_text(m)}" for m in folded)
+        prompt = f"Existing summary:\n{self.summary or '(none)'}\n\nNew exchanges:\n{transcript}"
+        try:
+            response = await acall_bedrock_converse(
+                bedrock_client, SUMMARY_SYSTEM_PROMPT,
+                [{"role": "user", "content": [{"text": prompt}]}],
+                max_tokens=600, purpose="qa_summary", model=router.route("qa_summary", "summary"),
+            )
+            self.summary = extract_text_from_response(response).strip()
+        except Exception:
+            budget_chars = self.token_budget * 4 // 2
+            self.summary = f"{self.summary}\n{transcript}"[-budget_chars:]
+        return len(folded) // 2
@@ -0,0 +1,138 @@
+"""Compact structured digests of phase results, used as context for dependent phases.
+
+A phase's `digest` fields (core.phases) are extracted from its markdown with
+one small model call and cached by content, so the itinerary prompt carries
+the chosen hotel, arrival time, transport modes and key rules instead of
+the first few thousand characters of every earlier result.
+"""
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from core import tracing
+from core.bedrock import call_bedrock_converse, extract_text_from_response
+from core.cache import TTLCache
+from core.phases import get_phase
+from core.routing import router
+from core.singleflight import SingleFlight
+
+DIGEST_CACHE_SIZE = int(os.environ.get("DIGEST_CACHE_SIZE", "1024"))
+DIGEST_CACHE_TTL = int(os.environ.get("DIGEST_CACHE_TTL", "86400"))
+# Size of the excerpt used when a digest cannot be extracted, and how long that
+# excerpt is cached before extraction is tried again
+DIGEST_FALLBACK_CHARS = 1200
+DIGEST_FALLBACK_TTL = int(os.environ.get("DIGEST_FALLBACK_TTL", "300"))
+# Digests of one phase's dependencies extracted at the same time
+DIGEST_CONCURRENCY = int(os.environ.get("DIGEST_CONCURRENCY", "4"))
+
+digest_cache = TTLCache("digest", DIGEST_CACHE_SIZE, DIGEST_CACHE_TTL, os.environ.get("PHASE_CACHE_DB"))
+_digest_flights = SingleFlight()
+_pool = ThreadPoolExecutor(max_workers=DIGEST_CONCURRENCY, thread_name_prefix="digest")
+
+DIGEST_SYSTEM_PROMPT = """You condense travel research into the facts a trip planner needs.
+Reply with a single JSON object and nothing else, using exactly the keys you are given.
+Each value is a short string (under 30 words) taken from the research, or null if the research does not say.
+Prefer the option the research recommends; keep names, times and prices exact."""
+
+
+def _digest_key(phase, markdown):
+    payload = json.dumps([phase["id"], sorted(phase.get("digest", {})), markdown])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def parse_digest(text, fields):
+    """The digest dict from a model reply, or None if it holds no usable fields."""
+    match = re.search(r"\{.*\}", text, re.DOTALL)
+    if not match:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    digest = {
+        field: " ".join(str(data[field]).split())
+        for field in fields
+        if data.get(field) not in (None, "", "null")
+    }
+    return digest or None
+
+
+def fallback_excerpt(markdown, max_chars=DIGEST_FALLBACK_CHARS):
+    """Headings, bolded lines and recommendations from a result, for when no digest is available."""
+    keep = []
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#") or "**" in stripped or "recommend" in stripped.lower():
+            keep.append(stripped)
+    excerpt = "\n".join(keep) or markdown
+    return excerpt[:max_chars]
+
+
+def get_digest(bedrock_client, phase, markdown):
+    """
+    Digest of a phase result: {field: value} for the phase's `digest` fields,
+    or {"excerpt": ...} if the phase has none or extraction fails.
+    Digests are cached by content and computed once when several callers
+    ask at the same time; a fallback is cached for DIGEST_FALLBACK_TTL only,
+    so a failed extraction is not retried by every dependent phase.
+    """
+    fields = phase.get("digest")
+    if not fields:
+        return {"excerpt": fallback_excerpt(markdown)}
+    key = _digest_key(phase, markdown)
+    hit = digest_cache.get(key)
+    if hit is not None:
+        return hit
+
+    def compute():
+        prompt = (
+            f"Research ({phase['title']}):\n{markdown}\n\n"
+            "Return a JSON object with these keys:\n"
+            + "\n".join(f'- "{field}": {description}' for field, description in fields.items())
+        )
+        try:
+            response = call_bedrock_converse(
+                bedrock_client, DIGEST_SYSTEM_PROMPT,
+                [{"role": "user", "content": [{"text": prompt}]}],
+                max_tokens=600, purpose=f"{phase['id']}_digest",
+                model=router.route(f"{phase['id']}_digest", "digest"),
+            )
+            digest = parse_digest(extract_text_from_response(response), fields)
+        except Exception:
+            digest = None
+        if digest is None:
+            digest = {"excerpt": fallback_excerpt(markdown)}
+            digest_cache.set(key, digest, DIGEST_FALLBACK_TTL)
+            return digest
+        digest_cache.set(key, digest)
+        return digest
+
+    digest, _ = _digest_flights.do(key, compute)
+    return digest
+
+
+def get_digests(bedrock_client, results):
+    """{phase_id: digest} for {phase_id: markdown}, extracted concurrently."""
+    futures = {
+        pid: _pool.submit(tracing.bind(get_digest), bedrock_client, get_phase(pid), markdown)
+        for pid, markdown in results.items()
+    }
+    return {pid: future.result() for pid, future in futures.items()}
+
+
+def format_digests(digests):
+    """Render {phase_id: digest} as compact markdown for a phase prompt."""
+    sections = []
+    for phase_id, digest in digests.items():
+        lines = [f"### {phase_id}"]
+        if "excerpt" in digest:
+            lines.append(digest["excerpt"])
+        else:
+            lines.extend(f"- {field.replace('_', ' ').capitalize()}: {value}" for field, value in digest.items())
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
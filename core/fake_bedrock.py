@@ -0,0 +1,418 @@
+"""Offline stand-in for the bedrock-runtime client, plus a transcript recorder.
+
+Select it with BEDROCK_BACKEND=fake. It implements converse and
+converse_stream with Bedrock's response shapes, validates cachePoint
+placement and simulates prompt caching. Repeated prompt prefixes report
+cacheReadInputTokens, and new ones report cacheWriteInputTokens.
+
+Answers come from, in order:
+- a replay file (FAKE_BEDROCK_REPLAY) recorded against real Bedrock with
+  BEDROCK_BACKEND=record, matched on the request's system prompt, messages
+  and tool availability
+- a script (FAKE_BEDROCK_SCRIPT), a JSON list of
+  {"match": <regex on the system prompt, optional>, "turns": [turn, ...]}
+  where turn n answers the request with n assistant messages so far and a
+  turn is {"text": ..., "tool_uses": [{"name", "input"}], "output_tokens": n}
+- the built-in default: one web_search on the first tool-enabled turn,
+  then a short markdown answer
+
+Latency is simulated with distributions given as "<ms>", "uniform:<lo>,<hi>"
+or "lognormal:<median>,<p99>": FAKE_BEDROCK_FIRST_TOKEN_MS (time to first
+token) and FAKE_BEDROCK_TOKENS_PER_SEC (output rate; 0 = instant).
+FAKE_BEDROCK_OUTPUT_TOKENS pads the final answers of tool-enabled (agent
+loop) requests to a sampled length so streaming and SSE fan-out see
+realistic volumes. FAKE_BEDROCK_MAX_CONCURRENCY simulates a quota: calls
+beyond that many in flight fail with ThrottlingException.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from core.util import estimate_tokens, parse_distribution
+
+MAX_CACHE_POINTS = 4
+CACHE_TTL_SECONDS = 300
+# Output tokens per contentBlockDelta event when streaming
+DELTA_TOKENS = 16
+
+FAKE_BEDROCK_SCRIPT = os.environ.get("FAKE_BEDROCK_SCRIPT")
+FAKE_BEDROCK_REPLAY = os.environ.get("FAKE_BEDROCK_REPLAY")
+FAKE_BEDROCK_FIRST_TOKEN_MS = os.environ.get("FAKE_BEDROCK_FIRST_TOKEN_MS", "0")
+FAKE_BEDROCK_TOKENS_PER_SEC = os.environ.get("FAKE_BEDROCK_TOKENS_PER_SEC", "0")
+FAKE_BEDROCK_OUTPUT_TOKENS = os.environ.get("FAKE_BEDROCK_OUTPUT_TOKENS")
+FAKE_BEDROCK_SEED = os.environ.get("FAKE_BEDROCK_SEED")
+# Calls in flight beyond this are rejected with ThrottlingException (0 = no quota)
+FAKE_BEDROCK_MAX_CONCURRENCY = int(os.environ.get("FAKE_BEDROCK_MAX_CONCURRENCY", "0"))
+BEDROCK_RECORD_PATH = os.environ.get("BEDROCK_RECORD_PATH", "bedrock_transcript.jsonl")
+
+_FILLER = (
+    "| Option | Details | Price |\n|---|---|---|\n"
+    "| Example option | Offline filler row from the fake Bedrock backend | $100 |\n"
+)
+
+
+def request_key(kwargs):
+    """Replay key for a Converse request: system prompt, messages (minus cache points) and tool use."""
+    def strip(blocks):
+        return [b for b in blocks if "cachePoint" not in b]
+
+    payload = {
+        "system": strip(kwargs.get("system", [])),
+        "messages": [{**m, "content": strip(m["content"])} for m in kwargs["messages"]],
+        "tools": bool(kwargs.get("toolConfig")),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def load_transcript(path):
+    """{request key: [recorded entry, ...]} from a BEDROCK_BACKEND=record JSONL file."""
+    entries = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                entries.setdefault(entry["key"], []).append(entry)
+    return entries
+
+
+class FakeBedrockClient:
+    """
+    Answers Converse / ConverseStream requests offline (see the module
+    docstring for where answers come from). Thread-safe.
+    """
+
+    def __init__(
+        self,
+        cache_ttl=CACHE_TTL_SECONDS,
+        script=None,
+        replay=None,
+        first_token_ms="0",
+        tokens_per_sec="0",
+        output_tokens=None,
+        seed=None,
+        max_concurrency=0,
+    ):
+        self.cache_ttl = cache_ttl
+        self.script = [
+            {**rule, "match": re.compile(rule["match"]) if rule.get("match") else None}
+            for rule in (script or [])
+        ]
+        self.replay = replay or {}
+        self._replayed = {}  # request key -> times served
+        self._first_token = parse_distribution(first_token_ms)
+        self._token_rate = parse_distribution(tokens_per_sec)
+        self._output_tokens = parse_distribution(output_tokens) if output_tokens else None
+        self._rng = random.Random(seed)
+        self._cache = {}  # prefix digest -> expires_at
+        self._lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self._in_flight = 0
+        self.calls = 0
+        self.replay_misses = 0
+        self.throttled = 0
+
+    @classmethod
+    def from_env(cls):
+        script = None
+        if FAKE_BEDROCK_SCRIPT:
+            with open(FAKE_BEDROCK_SCRIPT) as f:
+                script = json.load(f)
+        return cls(
+            script=script,
+            replay=load_transcript(FAKE_BEDROCK_REPLAY) if FAKE_BEDROCK_REPLAY else None,
+            first_token_ms=FAKE_BEDROCK_FIRST_TOKEN_MS,
+            tokens_per_sec=FAKE_BEDROCK_TOKENS_PER_SEC,
+            output_tokens=FAKE_BEDROCK_OUTPUT_TOKENS,
+            seed=int(FAKE_BEDROCK_SEED) if FAKE_BEDROCK_SEED else None,
+            max_concurrency=FAKE_BEDROCK_MAX_CONCURRENCY,
+        )
+
+    def close(self):
+        pass
+
+    def converse(self, **kwargs):
+        self._admit("Converse")
+        try:
+            response, _ = self._respond(kwargs)
+            output_tokens = response["usage"]["outputTokens"]
+            first_token, rate = self._timing()
+            time.sleep(first_token + (output_tokens / rate if rate else 0))
+            return response
+        finally:
+            self._leave()
+
+    def converse_stream(self, **kwargs):
+        self._admit("ConverseStream")
+        try:
+            response, recorded_events = self._respond(kwargs)
+        except Exception:
+            self._leave()
+            raise
+        return {"stream": _EventStream(self._stream(response, recorded_events), self._leave)}
+
+    def _admit(self, operation):
+        with self._lock:
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                self.throttled += 1
+                raise ClientError(
+                    {"Error": {"Code": "ThrottlingException", "Message": "Too many requests, please wait"}},
+                    operation,
+                )
+            self._in_flight += 1
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _respond(self, kwargs):
+        """(converse-shaped response, recorded stream events or None)."""
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        usage = self._usage(kwargs)
+
+        recorded = self._replay_entry(kwargs) if self.replay else None
+        if recorded is not None:
+            # Recorded output, with prompt-cache usage simulated for this run
+            response = recorded.get("response") or _reassemble(recorded["stream"])
+            _set_output_tokens(usage, response.get("usage", {}).get("outputTokens", 0))
+            return {**response, "usage": usage}, recorded.get("stream")
+
+        message = self._reply(kwargs, call)
+        _set_output_tokens(usage, estimate_tokens(message["content"]))
+        return {
+            "output": {"message": message},
+            "stopReason": "tool_use" if any("toolUse" in b for b in message["content"]) else "end_turn",
+            "usage": usage,
+            "metrics": {"latencyMs": 0},
+        }, None
+
+    def _replay_entry(self, kwargs):
+        key = request_key(kwargs)
+        entries = self.replay.get(key)
+        if not entries:
+            with self._lock:
+                self.replay_misses += 1
+            return None
+        with self._lock:
+            served = self._replayed.get(key, 0)
+            self._replayed[key] = served + 1
+        return entries[min(served, len(entries) - 1)]
+
+    def _timing(self):
+        with self._lock:
+            first_token = max(0.0, self._first_token(self._rng)) / 1000
+            rate = max(0.0, self._token_rate(self._rng))
+        return first_token, rate
+
+    def _reply(self, kwargs, call):
+        messages = kwargs["messages"]
+        turn_index = sum(1 for m in messages if m["role"] == "assistant")
+        system = "\n".join(b.get("text", "") for b in kwargs.get("system", []))
+        for rule in self.script:
+            if rule["match"] is None or rule["match"].search(system):
+                turns = rule["turns"]
+                return self._scripted(turns[min(turn_index, len(turns) - 1)], call)
+
+        searched = any(
+            "toolResult" in block for m in messages if m["role"] == "user" for block in m["content"]
+        )
+        if kwargs.get("toolConfig") and not searched:
+            question = next(
+                (b["text"] for b in messages[-1]["content"] if "text" in b), "travel"
+            )
+            return {"role": "assistant", "content": [
+                {"text": "Let me look that up."},
+                {"toolUse": {
+                    "toolUseId": f"tool-{call}",
+                    "name": "web_search",
+                    "input": {"query": " ".join(question.split()[:8])},
+                }},
+            ]}
+        text = "# Fake Result\n\nOffline response from the fake Bedrock backend.\n"
+        if kwargs.get("toolConfig"):
+            text = self._pad(text)  # agent-loop answers; utility calls (digests, summaries) stay short
+        return {"role": "assistant", "content": [{"text": text}]}
+
+    def _scripted(self, turn, call):
+        content = []
+        if turn.get("text"):
+            text = turn["text"]
+            if not turn.get("tool_uses"):
+                text = self._pad(text, turn.get("output_tokens"))
+            content.append({"text": text})
+        for i, tool_use in enumerate(turn.get("tool_uses", [])):
+            content.append({"toolUse": {
+                "toolUseId": f"tool-{call}-{i}",
+                "name": tool_use["name"],
+                "input": tool_use.get("input", {}),
+            }})
+        return {"role": "assistant", "content": content}
+
+    def _pad(self, text, output_tokens=None):
+        """Pad a final answer with filler table rows up to the sampled output length."""
+        if output_tokens is None and self._output_tokens is not None:
+            with self._lock:
+                output_tokens = int(self._output_tokens(self._rng))
+        if not output_tokens:
+            return text
+        missing = output_tokens * 4 - len(text)
+        if missing <= 0:
+            return text
+        return text + "\n" + (_FILLER * (missing // len(_FILLER) + 1))[:missing]
+
+    def _usage(self, kwargs):
+        """Token usage with simulated prompt caching at each cachePoint."""
+        blocks = [("system", b) for b in kwargs.get("system", [])]
+        for i, message in enumerate(kwargs["messages"]):
+            blocks.extend((f"m{i}", b) for b in message["content"])
+
+        points = [i for i, (_, block) in enumerate(blocks) if "cachePoint" in block]
+        if len(points) > MAX_CACHE_POINTS:
+            raise ValueError(f"Too many cachePoint blocks: {len(points)} > {MAX_CACHE_POINTS}")
+
+        total = estimate_tokens([b for _, b in blocks if "cachePoint" not in b])
+        read = written = 0
+        now = time.time()
+        digest = hashlib.sha256()
+        position = 0
+        prefix_tokens = 0
+        with self._lock:
+            for point in points:
+                for _, block in blocks[position:point]:
+                    digest.update(json.dumps(block, sort_keys=True).encode())
+                    prefix_tokens += estimate_tokens(block)
+                position = point + 1
+                key = digest.hexdigest()
+                if self._cache.get(key, 0) > now:
+                    read = prefix_tokens
+                self._cache[key] = now + self.cache_ttl
+            if points:
+                written = max(0, prefix_tokens - read)
+        return {
+            "inputTokens": max(0, total - read - written),
+            "outputTokens": 0,
+            "totalTokens": total,
+            "cacheReadInputTokens": read,
+            "cacheWriteInputTokens": written,
+        }
+
+    def _stream(self, response, recorded_events=None):
+        first_token, rate = self._timing()
+        time.sleep(first_token)
+        events = recorded_events or _stream_events(response)
+        for event in events:
+            delta = event.get("contentBlockDelta", {}).get("delta", {})
+            if rate and "text" in delta:
+                time.sleep(estimate_tokens(delta["text"]) / rate)
+            if "metadata" in event:
+                event = {"metadata": {**event["metadata"], "usage": response["usage"]}}
+            yield event
+
+
+class _EventStream:
+    """
+    ConverseStream body that gives back its in-flight slot once exhausted,
+    failed, closed or garbage-collected, including when it is never iterated
+    (a generator's finally would not run then).
+    """
+
+    def __init__(self, events, release):
+        self._events = events
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is not None:
+            self._events.close()
+            release()
+
+    __del__ = close
+
+
+def _stream_events(response):
+    """ConverseStream events for a converse-shaped response."""
+    yield {"messageStart": {"role": "assistant"}}
+    for index, block in enumerate(response["output"]["message"]["content"]):
+        if "text" in block:
+            text = block["text"]
+            step = DELTA_TOKENS * 4
+            for start in range(0, len(text), step):
+                yield {"contentBlockDelta": {"contentBlockIndex": index, "delta": {"text": text[start:start + step]}}}
+        else:
+            tool = block["toolUse"]
+            yield {"contentBlockStart": {"contentBlockIndex": index, "start": {
+                "toolUse": {"toolUseId": tool["toolUseId"], "name": tool["name"]},
+            }}}
+            yield {"contentBlockDelta": {"contentBlockIndex": index, "delta": {
+                "toolUse": {"input": json.dumps(tool["input"])},
+            }}}
+        yield {"contentBlockStop": {"contentBlockIndex": index}}
+    yield {"messageStop": {"stopReason": response["stopReason"]}}
+    yield {"metadata": {"usage": response["usage"], "metrics": response.get("metrics", {})}}
+
+
+def _set_output_tokens(usage, output_tokens):
+    usage["outputTokens"] = output_tokens
+    usage["totalTokens"] += output_tokens
+
+
+def _reassemble(events):
+    from core.bedrock import _read_stream
+    return _read_stream({"stream": events}, None)
+
+
+class RecordingBedrockClient:
+    """
+    Wraps a real bedrock-runtime client and appends every request key and
+    response (or stream events) to a JSONL transcript for FakeBedrockClient
+    replay. Selected with BEDROCK_BACKEND=record.
+    """
+
+    def __init__(self, client, path=BEDROCK_RECORD_PATH):
+        self.client = client
+        self.path = path
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.client.close()
+
+    def _write(self, entry):
+        with self._lock, open(self.path, "a") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    def converse(self, **kwargs):
+        response = self.client.converse(**kwargs)
+        kept = {k: v for k, v in response.items() if k != "ResponseMetadata"}
+        self._write({"key": request_key(kwargs), "response": kept})
+        return response
+
+    def converse_stream(self, **kwargs):
+        response = self.client.converse_stream(**kwargs)
+        key = request_key(kwargs)
+
+        def tee():
+            events = []
+            for event in response["stream"]:
+                events.append(event)
+                yield event
+            self._write({"key": key, "stream": events})
+
+        return {**response, "stream": tee()}
@@ -0,0 +1,244 @@
+"""Process-wide admission control for Bedrock calls.
+
+Every Converse / ConverseStream call passes through `governor.call`, which:
+- waits for room in token buckets sized to the account quota
+  (BEDROCK_RPM requests/minute, BEDROCK_TPM tokens/minute; 0 = no limit).
+  A call reserves its estimated input tokens plus max_tokens, and the
+  unused part is returned once the real usage is known.
+- waits for a concurrency slot. The limit adapts AIMD-style: +1 per
+  limit's worth of successes, halved on a throttle, between 1 and
+  BEDROCK_MAX_CONCURRENCY. Only calls admitted after the last decrease can
+  trigger the next one, so a burst of throttles halves the limit once.
+- retries throttles and transient server or connection errors up to
+  BEDROCK_MAX_RETRIES times with full-jitter exponential backoff
+  (botocore's own retries are off so attempts are not multiplied).
+- trips a circuit breaker after BEDROCK_BREAKER_THRESHOLD consecutive
+  transient failures. While open, calls fail immediately with
+  BedrockUnavailable; after BEDROCK_BREAKER_COOLDOWN seconds one probe call
+  is let through, and its success closes the breaker.
+
+Waiting calls are admitted in priority order: chat ("qa*" purposes) before
+research phases and digests, then first come, first served.
+"""
+
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+from core import metrics
+from core.util import estimate_tokens
+
+BEDROCK_RPM = int(os.environ.get("BEDROCK_RPM", "0"))
+BEDROCK_TPM = int(os.environ.get("BEDROCK_TPM", "0"))
+BEDROCK_MAX_CONCURRENCY = int(
+    os.environ.get("BEDROCK_MAX_CONCURRENCY", os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", "50"))
+)
+BEDROCK_MAX_RETRIES = int(os.environ.get("BEDROCK_MAX_RETRIES", "4"))
+BEDROCK_BACKOFF_BASE = float(os.environ.get("BEDROCK_BACKOFF_BASE", "0.5"))  # seconds
+BEDROCK_BACKOFF_CAP = float(os.environ.get("BEDROCK_BACKOFF_CAP", "20"))
+BEDROCK_BREAKER_THRESHOLD = int(os.environ.get("BEDROCK_BREAKER_THRESHOLD", "5"))
+BEDROCK_BREAKER_COOLDOWN = float(os.environ.get("BEDROCK_BREAKER_COOLDOWN", "30"))
+
+INTERACTIVE, BACKGROUND = 0, 1
+
+# Lower-cased: ConverseStream reports mid-stream errors (EventStreamError) with camelCase codes
+THROTTLE_CODES = {
+    "throttlingexception", "toomanyrequestsexception", "servicequotaexceededexception", "modelnotreadyexception",
+}
+TRANSIENT_CODES = {
+    "serviceunavailableexception", "internalserverexception", "modeltimeoutexception", "modelstreamerrorexception",
+}
+# botocore exceptions raised before any response arrives
+_CONNECTION_ERRORS = {"EndpointConnectionError", "ConnectionClosedError", "ReadTimeoutError", "ConnectTimeoutError"}
+
+
+class BedrockUnavailable(Exception):
+    """Raised without calling Bedrock while the circuit breaker is open."""
+
+
+def classify_error(error):
+    """"throttle", "transient" or "fatal" (a caller error that retrying will not fix)."""
+    code = (getattr(error, "response", {}).get("Error", {}).get("Code") or "").lower()
+    if code in THROTTLE_CODES:
+        return "throttle"
+    if code in TRANSIENT_CODES or type(error).__name__ in _CONNECTION_ERRORS:
+        return "transient"
+    return "fatal"
+
+
+def priority_for(purpose):
+    return INTERACTIVE if purpose.startswith("qa") else BACKGROUND
+
+
+def estimate_request_tokens(request):
+    """Rough input tokens of a Converse request (~4 characters per token)."""
+    return estimate_tokens([request.get("system", []), request.get("messages", []), request.get("toolConfig")])
+
+
+class _Bucket:
+    """Token bucket refilled continuously; the level may go negative when usage exceeds a reservation."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_for(self, amount):
+        """Seconds until `amount` (capped at capacity) is available."""
+        needed = min(amount, self.capacity) - self.level
+        return needed / self.rate if needed > 0 else 0.0
+
+
+class Governor:
+    def __init__(
+        self,
+        rpm=BEDROCK_RPM,
+        tpm=BEDROCK_TPM,
+        max_concurrency=BEDROCK_MAX_CONCURRENCY,
+        max_retries=BEDROCK_MAX_RETRIES,
+        backoff_base=BEDROCK_BACKOFF_BASE,
+        backoff_cap=BEDROCK_BACKOFF_CAP,
+        breaker_threshold=BEDROCK_BREAKER_THRESHOLD,
+        breaker_cooldown=BEDROCK_BREAKER_COOLDOWN,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = float(self.max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._requests = _Bucket(rpm) if rpm else None
+        self._tokens = _Bucket(tpm) if tpm else None
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, seq)
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._failures = 0        # consecutive transient failures
+        self._open_until = 0.0    # breaker open while now < open_until
+        self._probing = False     # half-open probe in flight
+
+    def call(self, fn, purpose="other", request_tokens=0, max_tokens=0, retryable=None):
+        """
+        Run fn() under the governor and return its result. `request_tokens`
+        and `max_tokens` size the TPM reservation. `retryable()`, if given,
+        is checked before retrying a failed attempt (a stream that already
+        delivered text must not be replayed).
+        """
+        priority = priority_for(purpose)
+        reserved = request_tokens + max_tokens
+        for attempt in range(self.max_retries + 1):
+            self._enter_breaker()
+            admitted = self._acquire(priority, reserved)
+            used, outcome = 0, "fatal"
+            try:
+                response = fn()
+                usage = response.get("usage", {}) if isinstance(response, dict) else {}
+                used = usage.get("inputTokens", 0) + usage.get("outputTokens", 0) or reserved
+                outcome = "ok"
+                return response
+            except Exception as e:
+                outcome = classify_error(e)
+                if outcome == "throttle":
+                    metrics.LLM_THROTTLES.inc(purpose=purpose)
+                if (
+                    outcome == "fatal"
+                    or attempt == self.max_retries
+                    or (retryable is not None and not retryable())
+                ):
+                    raise
+            finally:
+                self._release(admitted, reserved, used, outcome)
+            metrics.LLM_RETRIES.inc(purpose=purpose)
+            time.sleep(random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt)))
+
+    def _enter_breaker(self):
+        with self._cond:
+            if not self._open_until:
+                return
+            if time.monotonic() < self._open_until or self._probing:
+                raise BedrockUnavailable("Bedrock is failing; calls are paused by the circuit breaker")
+            self._probing = True
+
+    def _acquire(self, priority, reserved):
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while True:
+                if self._waiting[0] == ticket and self._in_flight < int(self.limit):
+                    now = time.monotonic()
+                    wait = 0.0
+                    if self._requests is not None:
+                        self._requests.refill(now)
+                        wait = self._requests.wait_for(1)
+                    if self._tokens is not None:
+                        self._tokens.refill(now)
+                        wait = max(wait, self._tokens.wait_for(reserved))
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            if self._requests is not None:
+                self._requests.level -= 1
+            if self._tokens is not None:
+                self._tokens.level -= reserved
+            self._cond.notify_all()
+            return time.monotonic()
+
+    def _release(self, admitted, reserved, used, outcome):
+        with self._cond:
+            self._in_flight -= 1
+            if self._tokens is not None:
+                self._tokens.level += reserved - used
+            now = time.monotonic()
+            if outcome == "ok":
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self._failures = 0
+                self._open_until = 0.0
+                self._probing = False
+            elif outcome == "throttle" and admitted > self._last_decrease:
+                self.limit = max(1.0, self.limit / 2)
+                self._last_decrease = now
+            if outcome == "transient" or (outcome == "throttle" and self._probing):
+                self._failures += 1
+                if self._probing or self._failures >= self.breaker_threshold:
+                    self._open_until = now + self.breaker_cooldown
+                    self._probing = False
+            elif self._probing:
+                # Fatal errors still show Bedrock is reachable
+                self._open_until = 0.0
+                self._probing = False
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            waiting = [0, 0]
+            for priority, _ in self._waiting:
+                waiting[priority] += 1
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "waiting_interactive": waiting[INTERACTIVE],
+                "waiting_background": waiting[BACKGROUND],
+                "breaker_open": 1 if self._open_until else 0,
+            }
+
+
+governor = Governor()
+
+metrics.Gauge(
+    "travelai_bedrock_governor", "Bedrock admission control: concurrency limit, in flight, waiting, breaker",
+    ("state",), callback=lambda: {(name,): value for name, value in governor.stats().items()},
+)
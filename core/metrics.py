@@ -0,0 +1,170 @@
+"""Minimal Prometheus-compatible metrics (counters, gauges, histograms).
+
+Metrics are process-local and rendered in the Prometheus text exposition
+format by render(). Recording is a dict update under a per-metric lock, so it
+is cheap enough for the hot path.
+"""
+
+import bisect
+import threading
+
+_registry = []
+
+# Latency buckets (seconds) spanning fast tool calls to multi-minute model calls
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """
+    Base for counters and gauges. Values are recorded directly, or computed
+    at scrape time by `callback`, which returns a number (no labels) or a
+    {label-values tuple: number} dict. Use callbacks to export state other
+    modules already track (cache stats, queue depth) without double counting.
+    """
+
+    kind = ""
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self):
+        """Yield (suffix, label_values, extra_labels, value) tuples."""
+        if self.callback is not None:
+            try:
+                values = self.callback()
+            except Exception:
+                return
+            items = values.items() if isinstance(values, dict) else [((), values)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for key, value in items:
+            if value is not None:
+                yield "", key, (), value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labels, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(e[0]), e[1], e[2])) for key, e in self._values.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                yield "_bucket", key, (("le", _format_value(bound)),), cumulative
+            yield "_sum", key, (), total
+            yield "_count", key, (), count
+
+
+def render():
+    """All registered metrics in Prometheus text format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# LLM calls
+LLM_REQUESTS = Counter(
+    "travelai_llm_requests_total", "Bedrock Converse calls", ("model", "purpose", "status"))
+LLM_LATENCY = Histogram(
+    "travelai_llm_latency_seconds", "Wall-clock Bedrock Converse call latency", ("model", "purpose"))
+LLM_SERVER_LATENCY = Histogram(
+    "travelai_llm_server_latency_seconds", "Bedrock-reported latency (metrics.latencyMs)", ("model", "purpose"))
+LLM_TOKENS = Counter(
+    "travelai_llm_tokens_total", "Tokens by kind (input, output, cache_read, cache_write)", ("model", "purpose", "kind"))
+LLM_THROTTLES = Counter("travelai_llm_throttles_total", "Bedrock calls rejected with a throttling error", ("purpose",))
+LLM_RETRIES = Counter("travelai_llm_retries_total", "Bedrock call attempts retried by the governor", ("purpose",))
+LLM_ROUTES = Counter(
+    "travelai_llm_routes_total", "Model routing decisions (core.routing)", ("purpose", "role", "model"))
+
+# Tool calls
+TOOL_CALLS = Counter("travelai_tool_calls_total", "Tool executions", ("tool", "status"))
+TOOL_LATENCY = Histogram("travelai_tool_latency_seconds", "Tool execution latency", ("tool",))
+
+# Search provider requests
+SEARCH_REQUESTS = Counter(
+    "travelai_search_requests_total", "Search provider requests (hedge losers are cancelled)", ("provider", "status"))
+SEARCH_LATENCY = Histogram("travelai_search_latency_seconds", "Search provider request latency", ("provider",))
+SEARCH_HEDGES = Counter("travelai_search_hedges_total", "Hedged search requests by winner", ("provider", "winner"))
+SEARCH_RESULT_TOKENS = Counter(
+    "travelai_search_result_tokens_total", "Estimated tokens of search results before and after trimming", ("kind",))
+
+# Research phases
+PHASES_TOTAL = Counter(
+    "travelai_phases_total", "Completed research phases", ("phase", "outcome", "cached"))
+PHASE_DURATION = Histogram(
+    "travelai_phase_duration_seconds", "Research phase duration", ("phase", "cached"))
+PHASE_ITERATIONS = Counter(
+    "travelai_phase_iterations_total", "Agent-loop model calls made by research phases", ("phase",))
+PHASE_SEARCHES = Counter(
+    "travelai_phase_searches_total", "Web searches made by research phases", ("phase",))
+
+# Q&A
+QA_TURNS = Counter("travelai_qa_turns_total", "Q&A turns", ("status",))
+QA_TURN_DURATION = Histogram("travelai_qa_turn_duration_seconds", "Q&A turn duration")
@@ -18,6 +18,20 @@ class TripPreferences(BaseModel):
     special_requirements: str = "none"
 
 
+class TripPreferencesUpdate(BaseModel):
+    """Partial TripPreferences; fields left out or null keep their current values."""
+    destination: Optional[str] = None
+    departing_from: Optional[str] = None
+    nationality: Optional[str] = None
+    days: Optional[int] = None
+    travel_dates: Optional[str] = None
+    travelers: Optional[str] = None
+    budget: Optional[str] = None
+    travel_style: Optional[str] = None
+    interests: Optional[str] = None
+    special_requirements: Optional[str] = None
+
+
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
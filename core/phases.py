@@ -1,4 +1,31 @@
-"""Research phase definitions with system prompts."""
+"""Research phase definitions with system prompts.
+
+Each phase declares `depends_on`: the ids of the phases whose results it
+needs as context. Phases with no pending dependencies can run concurrently.
+
+`uses` lists the TripPreferences fields the phase reads; only those are put in
+its prompt and in its result-cache key. `cache_ttl` is how long (seconds) a
+cached result for the phase stays valid.
+
+`digest` names the facts later phases need from this phase's result (field ->
+description). Dependent phases get that compact digest as context instead
+of the full markdown (see core.digest).
+"""
+
+# (TripPreferences field, label in phase prompts, default when unset; None = required)
+CONTEXT_FIELDS = [
+    ("destination", "Destination", None),
+    ("departing_from", "Departing from", "N/A"),
+    ("nationality", "Nationality", "N/A"),
+    ("days", "Duration", None),
+    ("travel_dates", "Travel dates", "flexible"),
+    ("travelers", "Travelers", "1 adult"),
+    ("budget", "Budget", "mid-range"),
+    ("travel_style", "Travel style", "mixed"),
+    ("interests", "Interests", "general sightseeing"),
+    ("special_requirements", "Special requirements", "none"),
+]
+PREFERENCE_FIELDS = [name for name, _, _ in CONTEXT_FIELDS]
 
 PHASES = [
     {
@@ -6,6 +33,16 @@ PHASES = [
         "icon": "\u2708\ufe0f",
         "title": "Flights & Travel Options",
         "color": "bright_cyan",
+        "depends_on": [],
+        "uses": ["destination", "departing_from", "days", "travel_dates", "travelers", "budget"],
+        "cache_ttl": 6 * 3600,
+        "digest": {
+            "recommended_option": "the flight or route recommended, with airline(s)",
+            "arrival_airport": "airport or station of arrival at the destination",
+            "arrival_time": "typical arrival time on day 1 of the recommended option",
+            "departure_time": "typical departure time of the return trip",
+            "price": "round-trip price for all travelers",
+        },
         "system": """You are a flight & travel research agent. You have a web_search tool.
 
 Research and present the TOP travel options to reach the destination.
@@ -59,6 +96,19 @@ Each recommendation MUST have a direct deep link \u2014 not just the homepage.""
         "icon": "\U0001f3e8",
         "title": "Hotels & Accommodation",
         "color": "bright_yellow",
+        "depends_on": [],
+        "uses": [
+            "destination", "days", "travel_dates", "travelers", "budget",
+            "travel_style", "interests", "special_requirements",
+        ],
+        "cache_ttl": 12 * 3600,
+        "digest": {
+            "recommended_hotel": "the top recommended hotel or stay",
+            "neighborhood": "area/neighborhood of that stay and why it suits the trip",
+            "nightly_price": "price per night",
+            "total_accommodation_cost": "accommodation cost for the whole stay",
+            "alternatives": "one or two alternative stays with their areas",
+        },
         "system": """You are a hotel & accommodation research agent. You have a web_search tool.
 
 Research the BEST staying options at the destination.
@@ -118,6 +168,19 @@ Each hotel recommendation MUST have a direct deep link \u2014 not just the homep
         "icon": "\U0001f697",
         "title": "Local Transport & Vehicle Rentals",
         "color": "bright_green",
+        "depends_on": [],
+        "uses": [
+            "destination", "days", "travel_dates", "travelers", "budget",
+            "travel_style", "special_requirements",
+        ],
+        "cache_ttl": 24 * 3600,
+        "digest": {
+            "airport_transfer": "best way from the arrival airport to the city, with price",
+            "main_modes": "transport modes recommended for getting around",
+            "passes": "passes, cards or apps worth buying, with price",
+            "car_rental": "whether to rent a car/scooter and from whom",
+            "daily_transport_budget": "typical transport cost per day",
+        },
         "system": """You are a local transport & vehicle rental research agent. You have a web_search tool.
 
 Research ALL ways to get around at the destination.
@@ -168,6 +231,16 @@ Each service MUST have a direct actionable link.""",
         "icon": "\u2696\ufe0f",
         "title": "Local Rules, Laws & Customs",
         "color": "bright_red",
+        "depends_on": [],
+        "uses": ["destination", "nationality", "travel_dates"],
+        "cache_ttl": 7 * 24 * 3600,
+        "digest": {
+            "entry_requirements": "visa / entry requirements for the traveler's nationality",
+            "key_laws": "laws a visitor could break unknowingly",
+            "etiquette": "dress codes, tipping and customs that affect plans",
+            "closures": "days, hours or seasons when sites or shops close",
+            "safety": "safety notes and emergency numbers",
+        },
         "system": """You are a travel safety & local rules research agent. You have a web_search tool.
 
 Research ALL important rules, laws, customs, and safety info.
@@ -179,6 +252,7 @@ Research ALL important rules, laws, customs, and safety info.
 4. Search for dress codes, photography rules
 5. Search for scams targeting tourists
 6. Search for emergency numbers and embassy info
+7. Search for public holidays, festivals and closures during the travel dates
 
 ## Output Format (Markdown):
 
@@ -187,6 +261,7 @@ Research ALL important rules, laws, customs, and safety info.
 ## \U0001f6c2 Entry Requirements
 ## \u26a0\ufe0f Important Laws for Tourists
 ## \U0001f64f Cultural Customs & Etiquette
+## \U0001f4c5 Holidays & Closures During Your Dates
 ## \U0001f3e5 Health & Safety
 ## \U0001f6a8 Common Tourist Scams
 ## \U0001f4f1 Useful Apps & Resources
@@ -202,6 +277,9 @@ Be SPECIFIC to this destination. No generic advice.""",
         "icon": "\U0001f5d3\ufe0f",
         "title": "Day-by-Day Itinerary",
         "color": "bright_magenta",
+        "depends_on": ["flights", "hotels", "transport", "rules"],
+        "uses": PREFERENCE_FIELDS,
+        "cache_ttl": 12 * 3600,
         "system": """You are an expert travel itinerary planner. You have a web_search tool.
 
 Create a detailed day-by-day itinerary.
@@ -252,3 +330,27 @@ For every attraction, restaurant, or bookable activity, provide a direct deep li
 NEVER use generic homepage links. Every link must go to the specific place/activity.""",
     },
 ]
+
+
+
+def get_phase(phase_id):
+    """Look up a phase definition by id."""
+    for phase in PHASES:
+        if phase["id"] == phase_id:
+            return phase
+    raise KeyError(phase_id)
+
+
+def affected_phases(changed_fields, phases=PHASES):
+    """
+    Ids of the phases whose output can change when `changed_fields` change:
+    those that use one of the fields, plus everything that depends on them
+    (transitively). Returned in declaration order.
+    """
+    changed = set(changed_fields)
+    affected = {phase["id"] for phase in phases if changed & set(phase["uses"])}
+    while True:
+        dependents = {phase["id"] for phase in phases if affected & set(phase["depends_on"])}
+        if dependents <= affected:
+            return [phase["id"] for phase in phases if phase["id"] in affected]
+        affected |= dependents
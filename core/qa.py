@@ -1,47 +1,174 @@
 """Q&A functionality — single-turn for API, loop for CLI."""
 
+import asyncio
+import itertools
+import time
+
+from core import metrics
 from core.bedrock import (
-    call_bedrock_converse,
+    BEDROCK_STREAMING,
+    acall_bedrock_converse,
+    acall_bedrock_converse_stream,
     build_assistant_message,
     extract_text_from_response,
+    get_stop_reason,
     get_tool_uses,
 )
-from core.search import get_web_search_tool, execute_web_search
+from core.conversation import Conversation
+from core.phases import PHASES
+from core.routing import BEDROCK_SEARCH_MAX_TOKENS, router
+from core.search import get_web_search_tool
+from core.tools import ToolExecutor
 
 
 def create_qa_system_prompt(prefs, all_results):
-    """Build the Q&A system prompt with research context."""
-    full_research = "\n\n".join(
-        f"## {pid.upper()}\n{text}" for pid, text in all_results.items()
+    """
+    Build the Q&A system prompt. It carries an outline of the research; the
+    relevant excerpts are retrieved per question (see core.retrieval).
+    """
+    outline = "\n".join(
+        f"- {phase['id']}: " + "; ".join(
+            line.lstrip("#").strip()
+            for line in all_results[phase["id"]].splitlines()
+            if line.startswith("## ")
+        )
+        for phase in PHASES
+        if phase["id"] in all_results
     )
     return f"""You are a helpful travel assistant. You have a web_search tool.
 You have detailed research about a trip to {prefs['destination']}.
-Answer questions using the research AND new web searches when needed.
+Each question comes with the research excerpts most relevant to it.
+Answer from those excerpts first; use web_search only for facts they do not cover.
 Always provide specific names, prices, links, and actionable info.
 
-Previous research summary:
-{full_research[:6000]}"""
+Research outline:
+{outline}"""
+
+
+def run_qa_turn(bedrock_client, system_prompt, messages, question, destination=None, research_index=None):
+    """Blocking wrapper around arun_qa_turn for CLI usage."""
+    return asyncio.run(
+        arun_qa_turn(bedrock_client, system_prompt, messages, question, destination, research_index)
+    )
 
 
-def run_qa_turn(bedrock_client, system_prompt, messages, question):
+async def arun_qa_turn(
+    bedrock_client, system_prompt, messages, question, destination=None, research_index=None, on_event=None
+):
     """
     Run a single Q&A turn: add the user question, run agentic loop, return answer.
-    Mutates `messages` in-place (appends user + assistant messages).
+
+    `messages` is a core.conversation.Conversation (or a plain history list,
+    which is wrapped in one). Older turns are summarized first if the
+    history is over its token budget. The question and final answer are
+    appended to the history; this turn's tool-use exchanges are not kept.
+    Token usage for the turn (and the models that served it) is left in
+    `conversation.last_usage`.
+    `destination` scopes the search cache keys to the trip.
+    `research_index` (core.retrieval.ResearchIndex) supplies the research
+    excerpts sent with the question; they are not stored in the history.
+
+    on_event(event_type, data), if given, is called from worker threads with
+    "search" / "search_complete" as web searches run and, when
+    BEDROCK_STREAMING is on, "delta" ({"text", "iteration"}) as answer text
+    arrives. Text from an iteration that ends in tool use is not part of the
+    answer; clients should reset when the iteration changes.
+    The history is only updated once the turn has finished.
     Returns the answer text.
     """
-    messages.append({"role": "user", "content": [{"text": question}]})
+    started = time.monotonic()
+    conversation = messages if isinstance(messages, Conversation) else Conversation(messages)
+    summarized_turns = await conversation.compact(bedrock_client)
+    usage = {
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_read_tokens": 0,
+        "cache_write_tokens": 0,
+        "model_calls": 0,
+        "models": [],
+        "history_tokens": conversation.history_tokens(),
+        "summarized_turns": summarized_turns,
+    }
+    conversation.last_usage = usage
 
     tools = [get_web_search_tool()]
-    qa_messages = list(messages)
+    turn_prompt = conversation.system_prompt(system_prompt)
+    prompt = question
+    if research_index is not None:
+        excerpts = research_index.excerpts(question)
+        if excerpts:
+            prompt = f"Relevant research excerpts:\n{excerpts}\n\nQuestion: {question}"
+    qa_messages = conversation.messages + [{"role": "user", "content": [{"text": prompt}]}]
 
-    for _ in range(8):
-        try:
-            resp = call_bedrock_converse(
-                bedrock_client, system_prompt, qa_messages, tools=tools, max_tokens=4096
+    searches = {}  # toolUseId -> search number within the turn
+    search_numbers = itertools.count(1)
+
+    def emit(event_type, data):
+        if on_event:
+            on_event(event_type, data)
+
+    # Search turns may run on a faster model than the answer (core.routing)
+    escalate = router.escalates("qa")
+    compiling = False
+
+    async def converse(iteration, role):
+        model = router.route("qa", role)
+        max_tokens = 4096
+        stream = on_event and BEDROCK_STREAMING
+        if role == "search" and escalate:
+            # A search turn that starts answering is re-run on the compile model: keep it short and unstreamed
+            max_tokens = min(max_tokens, BEDROCK_SEARCH_MAX_TOKENS)
+            stream = False
+        if stream:
+            resp = await acall_bedrock_converse_stream(
+                bedrock_client, turn_prompt, qa_messages, tools=tools, max_tokens=max_tokens,
+                on_text=lambda text: emit("delta", {"text": text, "iteration": iteration}),
+                purpose="qa", model=model,
             )
+        else:
+            resp = await acall_bedrock_converse(
+                bedrock_client, turn_prompt, qa_messages, tools=tools, max_tokens=max_tokens,
+                purpose="qa", model=model,
+            )
+        usage["model_calls"] += 1
+        if model not in usage["models"]:
+            usage["models"].append(model)
+        resp_usage = resp.get("usage", {})
+        usage["input_tokens"] += resp_usage.get("inputTokens", 0)
+        usage["output_tokens"] += resp_usage.get("outputTokens", 0)
+        usage["cache_read_tokens"] += resp_usage.get("cacheReadInputTokens", 0)
+        usage["cache_write_tokens"] += resp_usage.get("cacheWriteInputTokens", 0)
+        return resp
+
+    def on_start(tool_use):
+        if tool_use["name"] == "web_search":
+            searches[tool_use["toolUseId"]] = next(search_numbers)
+            emit("search", {
+                "query": tool_use.get("input", {}).get("query", ""),
+                "count": searches[tool_use["toolUseId"]],
+            })
+
+    def on_finish(tool_use, text, status, duration_ms):
+        if tool_use["toolUseId"] in searches:
+            emit("search_complete", {
+                "query": tool_use.get("input", {}).get("query", ""),
+                "count": searches[tool_use["toolUseId"]],
+                "status": status,
+                "duration_ms": duration_ms,
+            })
+
+    for iteration in range(8):
+        try:
+            resp = await converse(iteration, "compile" if compiling else "search")
+            if escalate and not compiling and (
+                not get_tool_uses(resp) or get_stop_reason(resp) == "max_tokens"
+            ):
+                compiling = True
+                resp = await converse(iteration, "compile")
         except Exception as e:
             answer = f"Error: {e}"
-            messages.append({"role": "assistant", "content": [{"text": answer}]})
+            conversation.record_turn(question, answer)
+            _observe_turn(started, "error")
             return answer
 
         tool_uses = get_tool_uses(resp)
@@ -49,20 +176,18 @@ def run_qa_turn(bedrock_client, system_prompt, messages, question):
 
         if tool_uses:
             qa_messages.append({"role": "assistant", "content": assistant_content})
-            tool_results = []
-            for tu in tool_uses:
-                query = tu.get("input", {}).get("query", "")
-                result = execute_web_search(query)
-                tool_results.append({
-                    "toolResult": {
-                        "toolUseId": tu["toolUseId"],
-                        "content": [{"text": result}],
-                    }
-                })
+            executor = ToolExecutor(on_start=on_start, on_finish=on_finish, destination=destination)
+            tool_results = await executor.arun(tool_uses)
             qa_messages.append({"role": "user", "content": tool_results})
         else:
             break
 
     answer = extract_text_from_response(resp)
-    messages.append({"role": "assistant", "content": [{"text": answer}]})
+    conversation.record_turn(question, answer)
+    _observe_turn(started, "ok")
     return answer
+
+
+def _observe_turn(started, status):
+    metrics.QA_TURNS.inc(status=status)
+    metrics.QA_TURN_DURATION.observe(time.monotonic() - started)
@@ -1,12 +1,48 @@
 """Research phase runner with callback-based event reporting."""
 
+import hashlib
+import json
+import os
+import time
+
+from core import metrics, tracing
 from core.bedrock import (
+    BEDROCK_STREAMING,
     call_bedrock_converse,
+    call_bedrock_converse_stream,
     build_assistant_message,
     extract_text_from_response,
+    get_stop_reason,
     get_tool_uses,
 )
-from core.search import get_web_search_tool, execute_web_search
+from core.cache import TTLCache
+from core.digest import format_digests, get_digests
+from core.phases import CONTEXT_FIELDS
+from core.routing import BEDROCK_SEARCH_MAX_TOKENS, router
+from core.search import get_web_search_tool
+from core.singleflight import SingleFlight
+from core.tools import ToolExecutor, build_tool_result
+
+PHASE_CACHE_SIZE = int(os.environ.get("PHASE_CACHE_SIZE", "512"))
+PHASE_CACHE_TTL = int(os.environ.get("PHASE_CACHE_TTL", "43200"))
+PHASE_CACHE_DB = os.environ.get("PHASE_CACHE_DB")  # unset = memory only
+
+phase_cache = TTLCache("phase", PHASE_CACHE_SIZE, PHASE_CACHE_TTL, PHASE_CACHE_DB)
+_phase_flights = SingleFlight()
+
+SEARCH_LIMIT_MESSAGE = (
+    "Search limit reached. Please compile your final response "
+    "using the information gathered so far."
+)
+ITERATION_LIMIT_MESSAGE = (
+    "No more searches are possible. Please compile your final response "
+    "using the information gathered so far."
+)
+ERROR_PREFIX = "*Error: "  # start of the markdown run_phase returns when a model call fails
+
+
+def is_error_result(markdown):
+    return markdown.startswith(ERROR_PREFIX)
 
 
 def get_phase_max_tokens(phase_id, trip_days):
@@ -18,19 +54,96 @@ def get_phase_max_tokens(phase_id, trip_days):
     return 8000
 
 
-def build_context(prefs):
-    """Build context string from preferences."""
-    return f"""Trip Details:
-- Destination: {prefs['destination']}
-- Departing from: {prefs.get('departing_from', 'N/A')}
-- Nationality: {prefs.get('nationality', 'N/A')}
-- Duration: {prefs['days']} days
-- Travel dates: {prefs.get('travel_dates', 'flexible')}
-- Travelers: {prefs.get('travelers', '1 adult')}
-- Budget: {prefs.get('budget', 'mid-range')}
-- Travel style: {prefs.get('travel_style', 'mixed')}
-- Interests: {prefs.get('interests', 'general sightseeing')}
-- Special requirements: {prefs.get('special_requirements', 'none')}"""
+def build_context(prefs, fields=None):
+    """Build context string from preferences, limited to `fields` when given."""
+    lines = ["Trip Details:"]
+    for name, label, default in CONTEXT_FIELDS:
+        if fields is not None and name not in fields:
+            continue
+        value = prefs[name] if default is None else prefs.get(name, default)
+        if name == "days":
+            value = f"{value} days"
+        lines.append(f"- {label}: {value}")
+    return "\n".join(lines)
+
+
+def _normalize_pref(value):
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def changed_fields(old_prefs, new_prefs):
+    """Preference fields whose values differ, ignoring case and whitespace in text."""
+    return [
+        name for name, _, _ in CONTEXT_FIELDS
+        if _normalize_pref(old_prefs.get(name)) != _normalize_pref(new_prefs.get(name))
+    ]
+
+
+def phase_cache_key(phase, prefs, previous_results):
+    """
+    Canonical hash of everything a phase's output depends on: its prompt, the
+    preference fields it `uses`, the results of the phases it depends on, and
+    the models it is routed to.
+    """
+    payload = {
+        "phase": phase["id"],
+        "system": hashlib.sha256(phase["system"].encode()).hexdigest(),
+        "models": [router.model_for(phase["id"], role) for role in ("search", "compile")],
+        "prefs": {f: _normalize_pref(prefs.get(f)) for f in phase["uses"]},
+        "deps": {
+            pid: hashlib.sha256(text.encode()).hexdigest()
+            for pid, text in sorted(previous_results.items())
+        },
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def run_phase_cached(bedrock_client, phase, prefs, previous_results, on_event=None):
+    """
+    run_phase with result memoization and single-flight.
+
+    Returns (markdown_text, search_count, cached). `cached` is True when the
+    result came from the phase cache or from an identical run already in
+    flight for another session; no Bedrock calls were made for this caller.
+    Failed runs are not cached.
+    """
+    started = time.monotonic()
+    key = phase_cache_key(phase, prefs, previous_results)
+    hit = phase_cache.get(key)
+    if hit is not None:
+        _observe_phase(phase, started, "ok", True)
+        return hit[0], hit[1], True
+
+    def compute():
+        failed = []
+
+        def track(event_type, data):
+            if event_type == "error":
+                failed.append(data)
+            if on_event:
+                on_event(event_type, data)
+
+        markdown, searches = run_phase(bedrock_client, phase, prefs, previous_results, on_event=track)
+        if not failed:
+            phase_cache.set(key, [markdown, searches], ttl_seconds=phase.get("cache_ttl"))
+        # Returned with the result so callers sharing this run see the failure too
+        return markdown, searches, bool(failed)
+
+    try:
+        (markdown, searches, failed), shared = _phase_flights.do(key, compute)
+    except Exception:
+        _observe_phase(phase, started, "error", False)
+        raise
+    _observe_phase(phase, started, "error" if failed else "ok", shared)
+    return markdown, searches, shared
+
+
+def _observe_phase(phase, started, outcome, cached):
+    cached = "true" if cached else "false"
+    metrics.PHASES_TOTAL.inc(phase=phase["id"], outcome=outcome, cached=cached)
+    metrics.PHASE_DURATION.observe(time.monotonic() - started, phase=phase["id"], cached=cached)
 
 
 def run_phase(bedrock_client, phase, prefs, previous_results, on_event=None):
@@ -38,18 +151,25 @@ def run_phase(bedrock_client, phase, prefs, previous_results, on_event=None):
     Run a single research phase with agentic tool-use loop.
 
     on_event callback signature: on_event(event_type: str, data: dict)
-    Event types: "search", "error"
+    Event types: "search", "search_complete", "delta", "error"
+    "delta" carries streamed model text ({"text", "iteration"}); it is only
+    produced when on_event is set and BEDROCK_STREAMING is on.
+    Tool calls from one model turn run concurrently (see core.tools.ToolExecutor).
+    `previous_results` ({phase_id: markdown}) reach the prompt as digests (see core.digest).
     When on_event is None (CLI mode), events are silently ignored.
     Returns (markdown_text, search_count).
     """
-    context = build_context(prefs)
+    context = build_context(prefs, phase.get("uses"))
     phase_max_tokens = get_phase_max_tokens(phase["id"], prefs["days"])
 
     prev_summary = ""
-    if previous_results:
-        prev_summary = "\n\n## Previous Research (use this context):\n"
-        for pid, result in previous_results.items():
-            prev_summary += f"\n### {pid}:\n{result[:2000]}...\n"
+    # Failed dependencies are left out rather than digesting their error message
+    digests = get_digests(
+        bedrock_client,
+        {pid: result for pid, result in previous_results.items() if not is_error_result(result)},
+    )
+    if digests:
+        prev_summary = f"\n\n## Findings From Earlier Research (use this context):\n{format_digests(digests)}\n"
 
     user_msg = f"""{context}
 {prev_summary}
@@ -67,64 +187,122 @@ Provide detailed results with actual links and prices."""
         if on_event:
             on_event(event_type, data)
 
-    for iteration in range(max_iterations):
-        try:
-            response = call_bedrock_converse(
-                bedrock_client, phase["system"], messages, tools=tools, max_tokens=phase_max_tokens
+    # Search turns may run on a faster model than the write-up (core.routing)
+    escalate = router.escalates(phase["id"])
+    compiling = False
+
+    def converse(iteration, role):
+        metrics.PHASE_ITERATIONS.inc(phase=phase["id"])
+        model = router.route(phase["id"], role)
+        max_tokens = phase_max_tokens
+        stream = on_event and BEDROCK_STREAMING
+        if role == "search" and escalate:
+            # A search turn that starts writing up is re-run on the compile model: keep it short and unstreamed
+            max_tokens = min(phase_max_tokens, BEDROCK_SEARCH_MAX_TOKENS)
+            stream = False
+        if stream:
+            return call_bedrock_converse_stream(
+                bedrock_client, phase["system"], messages, tools=tools, max_tokens=max_tokens,
+                on_text=lambda text: emit("delta", {"text": text, "iteration": iteration}),
+                purpose=phase["id"], model=model,
             )
-        except Exception as e:
-            emit("error", {"message": str(e)})
-            return f"*Error: {e}*", search_count
-
-        assistant_content = build_assistant_message(response)
-        tool_uses = get_tool_uses(response)
-
-        if tool_uses and search_count < max_searches:
-            messages.append({"role": "assistant", "content": assistant_content})
-
-            tool_results = []
-            for tool_use in tool_uses:
-                tool_name = tool_use["name"]
-                tool_id = tool_use["toolUseId"]
-                tool_input = tool_use.get("input", {})
-
-                if tool_name == "web_search":
-                    query = tool_input.get("query", "")
-                    search_count += 1
-                    emit("search", {"query": query, "count": search_count})
-
-                    search_result = execute_web_search(query)
-                    tool_results.append({
-                        "toolResult": {
-                            "toolUseId": tool_id,
-                            "content": [{"text": search_result}],
-                        }
-                    })
-
-            messages.append({"role": "user", "content": tool_results})
-
-        else:
-            if tool_uses and search_count >= max_searches:
+        return call_bedrock_converse(
+            bedrock_client, phase["system"], messages, tools=tools, max_tokens=max_tokens,
+            purpose=phase["id"], model=model,
+        )
+
+    for iteration in range(max_iterations):
+        with tracing.span(f"iteration {iteration}", "iteration", phase=phase["id"]):
+            try:
+                response = converse(iteration, "compile" if compiling else "search")
+                if escalate and not compiling and (
+                    not get_tool_uses(response) or get_stop_reason(response) == "max_tokens"
+                ):
+                    # Searching is done; write up on the compile model from the same messages
+                    compiling = True
+                    response = converse(iteration, "compile")
+            except Exception as e:
+                emit("error", {"message": str(e)})
+                return f"{ERROR_PREFIX}{e}*", search_count
+
+            assistant_content = build_assistant_message(response)
+            tool_uses = get_tool_uses(response)
+
+            if tool_uses and search_count < max_searches:
                 messages.append({"role": "assistant", "content": assistant_content})
-                tool_results = []
+
+                # Number searches in toolUseId order up front; calls over budget are not run
+                counts = {}
+                allowed, over_budget = [], []
                 for tool_use in tool_uses:
-                    tool_results.append({
-                        "toolResult": {
-                            "toolUseId": tool_use["toolUseId"],
-                            "content": [{"text": "Search limit reached. Please compile your final response using the information gathered so far."}],
-                            "status": "error",
-                        }
-                    })
-                messages.append({"role": "user", "content": tool_results})
+                    if tool_use["name"] == "web_search" and search_count < max_searches:
+                        search_count += 1
+                        metrics.PHASE_SEARCHES.inc(phase=phase["id"])
+                        counts[tool_use["toolUseId"]] = search_count
+                        allowed.append(tool_use)
+                    elif tool_use["name"] == "web_search":
+                        over_budget.append(tool_use)
+                    else:
+                        allowed.append(tool_use)
+
+                def on_start(tool_use):
+                    if tool_use["toolUseId"] in counts:
+                        emit("search", {
+                            "query": tool_use.get("input", {}).get("query", ""),
+                            "count": counts[tool_use["toolUseId"]],
+                        })
 
-                try:
-                    response = call_bedrock_converse(
-                        bedrock_client, phase["system"], messages, tools=tools, max_tokens=phase_max_tokens
+                def on_finish(tool_use, text, status, duration_ms):
+                    if tool_use["toolUseId"] in counts:
+                        emit("search_complete", {
+                            "query": tool_use.get("input", {}).get("query", ""),
+                            "count": counts[tool_use["toolUseId"]],
+                            "status": status,
+                            "duration_ms": duration_ms,
+                        })
+
+                executor = ToolExecutor(
+                    on_start=on_start, on_finish=on_finish, destination=prefs["destination"]
+                )
+                results_by_id = {
+                    block["toolResult"]["toolUseId"]: block
+                    for block in executor.run(allowed)
+                }
+                for tool_use in over_budget:
+                    results_by_id[tool_use["toolUseId"]] = build_tool_result(
+                        tool_use["toolUseId"], SEARCH_LIMIT_MESSAGE, "error"
                     )
-                except Exception as e:
-                    emit("error", {"message": str(e)})
-                    return f"*Error: {e}*", search_count
-            break
 
+                tool_results = [results_by_id[tu["toolUseId"]] for tu in tool_uses]
+                messages.append({"role": "user", "content": tool_results})
+
+            else:
+                if tool_uses and search_count >= max_searches:
+                    messages.append({"role": "assistant", "content": assistant_content})
+                    tool_results = [
+                        build_tool_result(tool_use["toolUseId"], SEARCH_LIMIT_MESSAGE, "error")
+                        for tool_use in tool_uses
+                    ]
+                    messages.append({"role": "user", "content": tool_results})
+
+                    try:
+                        response = converse(iteration + 1, "compile")
+                    except Exception as e:
+                        emit("error", {"message": str(e)})
+                        return f"{ERROR_PREFIX}{e}*", search_count
+                break
+    else:
+        # Out of iterations while the model still wanted tools: ask for the write-up now
+        messages[-1]["content"].append({"text": ITERATION_LIMIT_MESSAGE})
+        with tracing.span(f"iteration {max_iterations}", "iteration", phase=phase["id"]):
+            try:
+                response = converse(max_iterations, "compile")
+            except Exception as e:
+                emit("error", {"message": str(e)})
+                return f"{ERROR_PREFIX}{e}*", search_count
+
+    if get_tool_uses(response):
+        # Only a tool-use preamble, not a write-up: reported as an error so it is not cached
+        emit("error", {"message": "The model did not produce a final write-up"})
     final_text = extract_text_from_response(response)
     return final_text, search_count
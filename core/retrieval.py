@@ -0,0 +1,149 @@
+"""BM25 retrieval over research results for grounding Q&A answers."""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from core.phases import PHASES
+
+QA_RETRIEVAL_TOP_K = int(os.environ.get("QA_RETRIEVAL_TOP_K", "8"))
+QA_RETRIEVAL_MAX_CHARS = int(os.environ.get("QA_RETRIEVAL_MAX_CHARS", "6000"))
+CHUNK_MAX_CHARS = 700
+
+_STOPWORDS = {
+    "a", "an", "the", "in", "on", "at", "of", "for", "and", "or", "to", "is", "are",
+    "be", "with", "what", "which", "how", "i", "me", "my", "we", "our", "you", "your",
+    "it", "this", "that", "do", "does", "can", "should", "there", "any", "from", "by",
+}
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{2,}")
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in _STOPWORDS]
+
+
+def chunk_markdown(phase_id, markdown):
+    """
+    Split a phase's markdown into retrieval chunks, each prefixed with the
+    phase and heading path it sits under:
+    - listing tables (3+ columns): one chunk per row, with the header row
+    - two-column "Detail | Info" tables describe one item: one chunk per table
+    - other text: paragraph groups of up to CHUNK_MAX_CHARS
+    """
+    chunks = []
+    headings = []
+    table = []
+    buffer = []
+
+    def where():
+        return " > ".join([phase_id] + [h for _, h in headings])
+
+    def flush():
+        if buffer:
+            chunks.append(f"[{where()}]\n" + "\n".join(buffer))
+            buffer.clear()
+        if table:
+            header, rows = table[0], table[1:]
+            if header.strip("|").count("|") <= 1:
+                chunks.append(f"[{where()}]\n" + "\n".join(table))
+            else:
+                chunks.extend(f"[{where()}]\n{header}\n{row}" for row in rows)
+            table.clear()
+
+    for line in markdown.splitlines():
+        stripped = line.strip()
+        heading = _HEADING.match(stripped)
+        if heading:
+            flush()
+            level = len(heading.group(1))
+            headings = [(lvl, h) for lvl, h in headings if lvl < level] + [(level, heading.group(2))]
+        elif stripped.startswith("|"):
+            if not table:
+                flush()
+            if not _TABLE_SEPARATOR.match(stripped):
+                table.append(stripped)
+        else:
+            if table:
+                flush()
+            if not stripped or stripped == "---":
+                if sum(len(b) for b in buffer) >= CHUNK_MAX_CHARS // 2:
+                    flush()
+                continue
+            if sum(len(b) for b in buffer) + len(stripped) > CHUNK_MAX_CHARS:
+                flush()
+            buffer.append(stripped)
+    flush()
+    return chunks
+
+
+class ResearchIndex:
+    """Okapi BM25 index over the chunks of every phase result."""
+
+    def __init__(self, results, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.chunks = []
+        for phase in PHASES:
+            if phase["id"] in results:
+                self.chunks.extend(chunk_markdown(phase["id"], results[phase["id"]]))
+        self._term_freqs = [Counter(tokenize(chunk)) for chunk in self.chunks]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freq = Counter(term for tf in self._term_freqs for term in tf)
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def search(self, query, k=QA_RETRIEVAL_TOP_K):
+        """Return up to k (score, chunk) pairs, best first."""
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        if not terms:
+            return []
+        scored = []
+        for i, tf in enumerate(self._term_freqs):
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[i] / (self._avg_length or 1))
+            score = sum(
+                self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm)
+                for t in terms if t in tf
+            )
+            if score > 0:
+                scored.append((score, i))
+        scored.sort(reverse=True)
+        return [(score, self.chunks[i]) for score, i in scored[:k]]
+
+    def excerpts(self, query, k=QA_RETRIEVAL_TOP_K, max_chars=QA_RETRIEVAL_MAX_CHARS):
+        """Top chunks for a question, joined into one block within max_chars."""
+        picked, used = [], 0
+        for _, chunk in self.search(query, k):
+            if used + len(chunk) > max_chars:
+                break
+            picked.append(chunk)
+            used += len(chunk)
+        return "\n\n".join(picked)
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+_MAX_INDEXES = 128
+
+
+def get_research_index(results):
+    """Index for a results dict, built once per distinct set of results (LRU-cached)."""
+    digest = hashlib.sha256(
+        "\0".join(f"{pid}\0{text}" for pid, text in sorted(results.items())).encode()
+    ).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(digest)
+        if index is not None:
+            _indexes.move_to_end(digest)
+            return index
+    index = ResearchIndex(results)
+    with _indexes_lock:
+        _indexes[digest] = index
+        while len(_indexes) > _MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,79 @@
+"""Model routing: which Bedrock model serves each call.
+
+A call is routed by its purpose (a phase id, "<phase>_digest", "qa",
+"qa_summary") and its role:
+- "search": agent-loop turns that decide which searches to run
+- "compile": the final write-up of a research phase or Q&A answer
+- "digest": phase digests (core.digest)
+- "summary": Q&A history summaries (core.conversation)
+
+BEDROCK_MODEL_ID is the large model and BEDROCK_FAST_MODEL_ID the fast one;
+with no fast model every call uses the large model. The default routes send
+search turns, digests, summaries and all of Q&A to the fast model, and
+research write-ups to the large one. BEDROCK_MODEL_ROUTES overrides them
+with comma-separated "<purpose>:<role>=<model>" entries, where purpose or
+role may be "*" and model is "fast", "large" or a model id, e.g.
+"qa:compile=large,itinerary:*=large". The most specific entry wins
+(purpose:role, purpose:*, *:role, *:*).
+
+When a turn routed as "search" ends without asking for a search, the agent
+loops run it again as "compile" on the compile model if that differs, so
+only the final write-up pays for the large model.
+"""
+
+import os
+
+from core import metrics
+
+BEDROCK_MODEL_ID = os.environ.get("BEDROCK_MODEL_ID", "us.anthropic.claude-opus-4-6-v1")
+BEDROCK_FAST_MODEL_ID = os.environ.get("BEDROCK_FAST_MODEL_ID") or BEDROCK_MODEL_ID
+BEDROCK_MODEL_ROUTES = os.environ.get("BEDROCK_MODEL_ROUTES", "")
+# max_tokens for search turns that may be re-run as "compile"; a longer reply means the model is writing up
+BEDROCK_SEARCH_MAX_TOKENS = int(os.environ.get("BEDROCK_SEARCH_MAX_TOKENS", "2048"))
+
+DEFAULT_ROUTES = {
+    ("*", "*"): "large",
+    ("*", "search"): "fast",
+    ("*", "digest"): "fast",
+    ("*", "summary"): "fast",
+    ("qa", "*"): "fast",
+}
+
+
+def parse_routes(spec):
+    """{(purpose, role): model} from "<purpose>:<role>=<model>,..."."""
+    routes = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        target, _, model = entry.partition("=")
+        purpose, _, role = target.strip().partition(":")
+        if not model.strip():
+            raise ValueError(f"Invalid model route: {entry!r}")
+        routes[(purpose or "*", role or "*")] = model.strip()
+    return routes
+
+
+class ModelRouter:
+    def __init__(self, large=BEDROCK_MODEL_ID, fast=BEDROCK_FAST_MODEL_ID, routes=BEDROCK_MODEL_ROUTES):
+        self.models = {"large": large, "fast": fast}
+        self.routes = {**DEFAULT_ROUTES, **parse_routes(routes)}
+
+    def model_for(self, purpose, role):
+        """The model id for a call; does not record the decision."""
+        for key in ((purpose, role), (purpose, "*"), ("*", role), ("*", "*")):
+            if key in self.routes:
+                return self.models.get(self.routes[key], self.routes[key])
+
+    def route(self, purpose, role):
+        """The model id for a call, counted in core.metrics."""
+        model = self.model_for(purpose, role)
+        metrics.LLM_ROUTES.inc(purpose=purpose, role=role, model=model)
+        return model
+
+    def escalates(self, purpose):
+        """True when a finished "search" turn must be re-run on a different "compile" model."""
+        return self.model_for(purpose, "search") != self.model_for(purpose, "compile")
+
+
+router = ModelRouter()
@@ -1,19 +1,45 @@
-"""Save research results to markdown file."""
+"""Save research results to markdown, and render them as JSON or HTML exports."""
 
+import html
+import json
 import re
 from datetime import datetime
 from core.phases import PHASES
 
+try:
+    import markdown as markdown_lib
+except ImportError:  # pragma: no cover - optional dependency
+    markdown_lib = None
 
-def save_full_plan(all_results, prefs):
-    """Save the complete plan to markdown. Returns (filename, content)."""
+# format -> (file extension, media type)
+EXPORT_FORMATS = {
+    "md": ("md", "text/markdown; charset=utf-8"),
+    "json": ("json", "application/json"),
+    "html": ("html", "text/html; charset=utf-8"),
+}
+
+# href/src values produced by the markdown library; checked after entity decoding
+_URL_ATTR = re.compile(r'\b(href|src)="([^"]*)"', re.IGNORECASE)
+_SAFE_URL_SCHEMES = ("http:", "https:", "mailto:", "tel:")
+
+
+def plan_filename(prefs, fmt="md", version=None):
+    """
+    trip_<destination>_v<version>.<ext>, stable for a results version so it
+    matches the cached download's ETag. Without a version (CLI saves) the
+    current time is used instead.
+    """
     safe = re.sub(r'[^\w\s-]', '', prefs['destination']).strip().replace(' ', '_').lower()
-    ts = datetime.now().strftime("%Y%m%d_%H%M")
-    filename = f"trip_{safe}_{ts}.md"
+    suffix = f"v{version}" if version is not None else datetime.now().strftime("%Y%m%d_%H%M")
+    return f"trip_{safe}_{suffix}.{EXPORT_FORMATS[fmt][0]}"
 
+
+def render_markdown(all_results, prefs, generated_at=None):
+    """The complete plan as markdown. The "Generated on" line is left out when generated_at is None."""
     lines = []
     lines.append(f"# \U0001f30d Complete Trip Plan: {prefs['destination']}\n")
-    lines.append(f"_Generated on {datetime.now().strftime('%B %d, %Y at %H:%M')}_\n\n")
+    if generated_at is not None:
+        lines.append(f"_Generated on {generated_at.strftime('%B %d, %Y at %H:%M')}_\n\n")
     lines.append(f"**Traveler:** {prefs.get('nationality', 'N/A')} | **From:** {prefs.get('departing_from', 'N/A')} | ")
     lines.append(f"**Dates:** {prefs.get('travel_dates', 'flexible')} | **Budget:** {prefs.get('budget', 'mid-range')}\n\n")
     lines.append("---\n\n")
@@ -22,8 +48,66 @@ def save_full_plan(all_results, prefs):
         if phase["id"] in all_results:
             lines.append(f"\n{all_results[phase['id']]}\n\n---\n\n")
 
-    content = "".join(lines)
-    return filename, content
+    return "".join(lines)
+
+
+def render_json(all_results, prefs):
+    """The plan as JSON: preferences plus each completed phase's markdown, in phase order."""
+    return json.dumps({
+        "destination": prefs["destination"],
+        "prefs": prefs,
+        "phases": [
+            {"id": phase["id"], "title": phase["title"], "markdown": all_results[phase["id"]]}
+            for phase in PHASES if phase["id"] in all_results
+        ],
+    }, ensure_ascii=False, indent=2)
+
+
+def _safe_url(match):
+    url = "".join(ch for ch in html.unescape(match.group(2)) if ch > " ").lower()
+    if ":" in url.split("/", 1)[0] and not url.startswith(_SAFE_URL_SCHEMES):
+        return f'{match.group(1)}="#"'
+    return match.group(0)
+
+
+def render_html(all_results, prefs):
+    """
+    The plan as a standalone HTML page. Uses the optional `markdown` package;
+    without it each section is shown as preformatted text.
+
+    The markdown comes from the model and from web search snippets, so raw
+    HTML in it is escaped rather than passed through, and links or images
+    with schemes other than http(s), mailto and tel are neutralized.
+    """
+    source = render_markdown(all_results, prefs)
+    if markdown_lib is not None:
+        body = markdown_lib.markdown(source.replace("<", "&lt;"), extensions=["tables"])
+        body = _URL_ATTR.sub(_safe_url, body)
+    else:
+        body = f"<pre>{html.escape(source)}</pre>"
+    title = html.escape(f"Trip Plan: {prefs['destination']}")
+    return (
+        "<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+        f"<title>{title}</title>\n"
+        "<style>body{max-width:52rem;margin:2rem auto;padding:0 1rem;font-family:system-ui,sans-serif;"
+        "line-height:1.5}pre{white-space:pre-wrap}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:.25rem .5rem}</style>\n"
+        f"</head>\n<body>\n{body}\n</body>\n</html>\n"
+    )
+
+
+def render_plan(all_results, prefs, fmt="md"):
+    """Render the plan in one of EXPORT_FORMATS. The output depends only on the results and prefs."""
+    if fmt == "json":
+        return render_json(all_results, prefs)
+    if fmt == "html":
+        return render_html(all_results, prefs)
+    return render_markdown(all_results, prefs)
+
+
+def save_full_plan(all_results, prefs):
+    """Save the complete plan to markdown. Returns (filename, content)."""
+    return plan_filename(prefs), render_markdown(all_results, prefs, generated_at=datetime.now())
 
 
 def save_full_plan_to_file(all_results, prefs):
@@ -0,0 +1,62 @@
+"""Dependency-aware phase scheduler: runs ready phases concurrently."""
+
+import contextvars
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+PHASE_CONCURRENCY = int(os.environ.get("RESEARCH_PHASE_CONCURRENCY", "4"))
+
+
+def validate_phase_graph(phases):
+    """Raise ValueError if a phase depends on an unknown phase or the graph has a cycle."""
+    ids = {phase["id"] for phase in phases}
+    for phase in phases:
+        for dep in phase.get("depends_on", []):
+            if dep not in ids:
+                raise ValueError(f"Phase '{phase['id']}' depends on unknown phase '{dep}'")
+
+    done = set()
+    pending = list(phases)
+    while pending:
+        ready = [p for p in pending if set(p.get("depends_on", [])) <= done]
+        if not ready:
+            raise ValueError(f"Phase dependency cycle among: {[p['id'] for p in pending]}")
+        done.update(p["id"] for p in ready)
+        pending = [p for p in pending if p["id"] not in done]
+
+
+def run_phase_graph(phases, run_one, max_concurrency=None):
+    """
+    Run `run_one(phase)` for every phase, starting each as soon as all of its
+    `depends_on` phases have finished (successfully or not).
+
+    Ready phases are started in declaration order, at most `max_concurrency`
+    at a time. Exceptions raised by `run_one` are not swallowed: the first one
+    is re-raised after every phase that can still run has finished.
+    `run_one` runs in a copy of the caller's context (contextvars).
+    """
+    validate_phase_graph(phases)
+    max_concurrency = max(1, max_concurrency or PHASE_CONCURRENCY)
+
+    finished = set()
+    pending = list(phases)
+    running = {}
+    first_error = None
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="phase") as pool:
+        while pending or running:
+            for phase in list(pending):
+                if len(running) >= max_concurrency:
+                    break
+                if set(phase.get("depends_on", [])) <= finished:
+                    pending.remove(phase)
+                    running[pool.submit(contextvars.copy_context().run, run_one, phase)] = phase["id"]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished.add(running.pop(future))
+                if future.exception() is not None and first_error is None:
+                    first_error = future.exception()
+
+    if first_error is not None:
+        raise first_error
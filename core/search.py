@@ -1,6 +1,25 @@
 """Web search tool definition and execution."""
 
 import os
+import re
+
+from core.cache import TTLCache
+from core.search_providers import NO_RESULTS, get_search_client
+
+SEARCH_CACHE_SIZE = int(os.environ.get("SEARCH_CACHE_SIZE", "2048"))
+SEARCH_CACHE_TTL = int(os.environ.get("SEARCH_CACHE_TTL", "86400"))
+SEARCH_CACHE_DB = os.environ.get("SEARCH_CACHE_DB")  # e.g. ./cache.sqlite3; unset = memory only
+# Queries that came back empty are retried after this many seconds
+SEARCH_EMPTY_CACHE_TTL = int(os.environ.get("SEARCH_EMPTY_CACHE_TTL", "300"))
+
+# Filler words dropped from cache keys. Direction words ("from", "to") are kept
+# so "AMD to GOI" and "GOI to AMD" stay distinct.
+_STOPWORDS = {
+    "a", "an", "the", "in", "on", "at", "of", "for", "and", "or", "with",
+    "near", "around", "about", "is", "are", "what", "which", "how", "me",
+}
+
+search_cache = TTLCache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL, SEARCH_CACHE_DB)
 
 
 def get_web_search_tool():
@@ -30,12 +49,48 @@ def get_web_search_tool():
     }
 
 
-def execute_web_search(query):
+def normalize_query(query, destination=None):
+    """
+    Build a cache key from a search query: lowercased, punctuation and filler
+    words removed. The destination's tokens are pulled out into a prefix, so
+    "best hotels in Goa" and "Goa best hotels" share a key when the
+    destination is Goa.
+    """
+    tokens = [t for t in re.findall(r"\w+", query.lower()) if t not in _STOPWORDS]
+    if not destination:
+        return " ".join(tokens)
+    dest_tokens = [t for t in re.findall(r"\w+", destination.lower()) if t not in _STOPWORDS]
+    rest = [t for t in tokens if t not in dest_tokens]
+    return f"{' '.join(dest_tokens)}|{' '.join(rest)}"
+
+
+def execute_web_search(query, destination=None):
+    """
+    Execute web search, served from the shared search cache when possible.
+    `destination` (the trip destination) only affects the cache key.
+
+    Provider failures raise and are never cached; empty results are cached
+    for SEARCH_EMPTY_CACHE_TTL only, so a transient miss does not stick for
+    the full TTL.
+    """
+    key = normalize_query(query, destination)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+    result = _search_backend(query)
+    search_cache.set(key, result, SEARCH_EMPTY_CACHE_TTL if result == NO_RESULTS else None)
+    return result
+
+
+def _search_backend(query):
     """
-    Execute web search.
-    Default: Returns acknowledgment so the model uses its training knowledge.
-    Replace with a real search API (Tavily, SerpAPI, Google, Bing) for live results.
+    Results from the SEARCH_BACKEND provider (core.search_providers), trimmed
+    to SEARCH_TOKEN_BUDGET. The default placeholder backend returns an
+    acknowledgment so the model uses its training knowledge.
     """
+    client = get_search_client()
+    if client is not None:
+        return client.search(query)
     return (
         f"Web search executed for: '{query}'. "
         f"Please provide the most detailed, current, and accurate information "
@@ -0,0 +1,364 @@
+"""Web search providers: pooled async HTTP, rate limits, hedging and result trimming.
+
+SEARCH_BACKEND selects the provider behind the web_search tool:
+- "placeholder" (default): no search; the model is told to use what it knows
+- "tavily" (TAVILY_API_KEY) or "brave" (BRAVE_API_KEY): live results over
+  HTTP via `httpx` (in requirements.txt)
+- "fixture": offline results from SEARCH_FIXTURES, a JSON list of
+  {"match": <regex on the query, optional>, "results": [{"title", "url", "content"}]},
+  with generated results for queries nothing matches. SEARCH_FIXTURE_LATENCY_MS
+  takes the same distributions as FAKE_BEDROCK_FIRST_TOKEN_MS.
+
+Requests from every tool thread run on one background event loop sharing a
+connection pool. Each provider has its own rate limit (token bucket) and
+timeout. When SEARCH_HEDGE_MS is set, a request still unanswered after
+that long is sent a second time and the first answer wins, if the rate
+limit has room for the extra request.
+
+Results are cleaned (markup stripped, duplicates dropped) and cut to
+SEARCH_TOKEN_BUDGET before they reach the model.
+"""
+
+import asyncio
+import html
+import json
+import os
+import random
+import re
+import threading
+import time
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - optional dependency
+    httpx = None
+
+from core import metrics
+from core.util import estimate_tokens, parse_distribution
+
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "placeholder")
+SEARCH_MAX_RESULTS = int(os.environ.get("SEARCH_MAX_RESULTS", "5"))
+# Tokens of search results handed to the model per web_search call
+SEARCH_TOKEN_BUDGET = int(os.environ.get("SEARCH_TOKEN_BUDGET", "1200"))
+# Re-send a request still pending after this many ms (0 disables hedging)
+SEARCH_HEDGE_MS = int(os.environ.get("SEARCH_HEDGE_MS", "0"))
+SEARCH_POOL_CONNECTIONS = int(os.environ.get("SEARCH_POOL_CONNECTIONS", "20"))
+# Override the provider's default requests/second and timeout (seconds)
+SEARCH_RATE_LIMIT = os.environ.get("SEARCH_RATE_LIMIT")
+SEARCH_TIMEOUT = os.environ.get("SEARCH_TIMEOUT")
+SEARCH_FIXTURES = os.environ.get("SEARCH_FIXTURES")
+SEARCH_FIXTURE_LATENCY_MS = os.environ.get("SEARCH_FIXTURE_LATENCY_MS", "0")
+
+# Results shorter than this after cleaning carry no useful content
+_MIN_CONTENT_CHARS = 40
+# trim_results' text when nothing usable came back
+NO_RESULTS = "No results found."
+
+
+class SearchError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per second with bursts of up to `burst`. Used from one event loop."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SearchProvider:
+    """
+    A search API. Subclasses set the defaults below and implement
+    fetch(http, query, max_results) -> [{"title", "url", "content"}].
+    """
+
+    name = "provider"
+    rate_limit = 5.0   # requests per second
+    timeout = 10.0     # seconds per request
+
+    def __init__(self, rate_limit=None, timeout=None):
+        self.limiter = RateLimiter(float(rate_limit or self.rate_limit))
+        self.timeout = float(timeout or self.timeout)
+
+    async def fetch(self, http, query, max_results):
+        raise NotImplementedError
+
+
+class TavilyProvider(SearchProvider):
+    name = "tavily"
+    rate_limit = 5.0
+    timeout = 10.0
+    url = "https://api.tavily.com/search"
+
+    def __init__(self, api_key=None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key or os.environ.get("TAVILY_API_KEY")
+        if not self.api_key:
+            raise SearchError("TAVILY_API_KEY is not set")
+
+    async def fetch(self, http, query, max_results):
+        response = await http.post(self.url, timeout=self.timeout, json={
+            "api_key": self.api_key, "query": query, "max_results": max_results, "search_depth": "basic",
+        })
+        response.raise_for_status()
+        return [
+            {"title": r.get("title", ""), "url": r.get("url", ""), "content": r.get("content", "")}
+            for r in response.json().get("results", [])
+        ]
+
+
+class BraveProvider(SearchProvider):
+    name = "brave"
+    rate_limit = 1.0
+    timeout = 6.0
+    url = "https://api.search.brave.com/res/v1/web/search"
+
+    def __init__(self, api_key=None, **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key or os.environ.get("BRAVE_API_KEY")
+        if not self.api_key:
+            raise SearchError("BRAVE_API_KEY is not set")
+
+    async def fetch(self, http, query, max_results):
+        response = await http.get(
+            self.url, timeout=self.timeout,
+            params={"q": query, "count": max_results},
+            headers={"X-Subscription-Token": self.api_key, "Accept": "application/json"},
+        )
+        response.raise_for_status()
+        return [
+            {
+                "title": r.get("title", ""),
+                "url": r.get("url", ""),
+                "content": " ".join([r.get("description", ""), *r.get("extra_snippets", [])]),
+            }
+            for r in response.json().get("web", {}).get("results", [])
+        ]
+
+
+class FixtureProvider(SearchProvider):
+    """Offline results from a fixture file (see the module docstring), with simulated latency."""
+
+    name = "fixture"
+    rate_limit = 1000.0
+    timeout = 30.0
+
+    def __init__(self, path=None, latency_ms="0", seed=None, **kwargs):
+        super().__init__(**kwargs)
+        self.fixtures = []
+        if path:
+            with open(path) as f:
+                self.fixtures = [
+                    (re.compile(entry.get("match", ""), re.IGNORECASE), entry["results"])
+                    for entry in json.load(f)
+                ]
+        self._latency = parse_distribution(latency_ms)
+        self._rng = random.Random(seed)
+
+    async def fetch(self, http, query, max_results):
+        await asyncio.sleep(max(0.0, self._latency(self._rng)) / 1000)
+        for pattern, results in self.fixtures:
+            if pattern.search(query):
+                return results[:max_results]
+        return [
+            {
+                "title": f"{query.title()} - result {i}",
+                "url": f"https://example.com/{re.sub(r'[^a-z0-9]+', '-', query.lower()).strip('-')}/{i}",
+                "content": (
+                    f"Fixture result {i} for {query}. Offline content from the fixture search provider, "
+                    "with a name, a price of $100 and an address to stand in for a real page. " * 3
+                ),
+            }
+            for i in range(1, max_results + 1)
+        ]
+
+
+PROVIDERS = {"tavily": TavilyProvider, "brave": BraveProvider, "fixture": FixtureProvider}
+
+
+def clean_text(text):
+    """Plain text from a result snippet or page: markup, entities and runs of whitespace removed."""
+    text = re.sub(r"<(script|style)\b.*?</\1>", " ", text, flags=re.IGNORECASE | re.DOTALL)
+    text = re.sub(r"<[^>]+>", " ", text)
+    text = html.unescape(text)
+    text = re.sub(r"!?\[([^\]]*)\]\([^)]*\)", r"\1", text)  # markdown links and images
+    return " ".join(text.split())
+
+
+def _cut(text, max_chars):
+    """text shortened to max_chars, at a sentence (or else word) boundary."""
+    if len(text) <= max_chars:
+        return text
+    head = text[:max_chars]
+    sentence_end = max(head.rfind(". "), head.rfind("! "), head.rfind("? "))
+    if sentence_end > max_chars // 2:
+        return head[:sentence_end + 1]
+    return head.rsplit(" ", 1)[0] + " …"
+
+
+def trim_results(results, token_budget=SEARCH_TOKEN_BUDGET):
+    """
+    Format results as compact text within token_budget: cleaned, duplicate
+    URLs and near-empty results dropped, and the budget shared between the
+    remaining results (short ones leave their unused share to the others).
+    """
+    seen, kept = set(), []
+    for result in results:
+        url = result.get("url", "").split("#")[0].rstrip("/")
+        content = clean_text(result.get("content", ""))
+        if url in seen or len(content) < _MIN_CONTENT_CHARS:
+            continue
+        seen.add(url)
+        kept.append((clean_text(result.get("title", "")), result.get("url", ""), content))
+    if not kept:
+        return NO_RESULTS
+
+    headers = [f"[{i}] {title}\n{url}\n" for i, (title, url, _) in enumerate(kept, 1)]
+    available = max(0, token_budget * 4 - sum(len(h) + 1 for h in headers))
+    allowances = {}
+    pending = sorted(range(len(kept)), key=lambda i: len(kept[i][2]))
+    while pending:
+        share = available // len(pending)
+        i = pending.pop(0)
+        allowances[i] = min(len(kept[i][2]), share)
+        available -= allowances[i]
+    return "\n".join(
+        header + _cut(content, allowances[i])
+        for i, (header, (_, _, content)) in enumerate(zip(headers, kept))
+        if allowances[i] >= _MIN_CONTENT_CHARS
+    )
+
+
+class SearchClient:
+    """
+    Runs a provider's requests on a background event loop with one pooled
+    HTTP client, so every tool thread shares connections. Thread-safe.
+    """
+
+    def __init__(self, provider, hedge_ms=SEARCH_HEDGE_MS, max_results=SEARCH_MAX_RESULTS,
+                 token_budget=SEARCH_TOKEN_BUDGET, pool_connections=SEARCH_POOL_CONNECTIONS):
+        self.provider = provider
+        self.hedge_ms = hedge_ms
+        self.max_results = max_results
+        self.token_budget = token_budget
+        self.pool_connections = pool_connections
+        self._http = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="search-loop", daemon=True)
+        self._thread.start()
+
+    def search(self, query):
+        """Trimmed result text for a query. Blocking; raises SearchError on failure."""
+        future = asyncio.run_coroutine_threadsafe(self._search(query), self._loop)
+        results = future.result()
+        text = trim_results(results, self.token_budget)
+        metrics.SEARCH_RESULT_TOKENS.inc(estimate_tokens(results), kind="raw")
+        metrics.SEARCH_RESULT_TOKENS.inc(estimate_tokens(text), kind="trimmed")
+        return text
+
+    async def _search(self, query):
+        if self._http is None and httpx is not None:
+            limits = httpx.Limits(
+                max_connections=self.pool_connections, max_keepalive_connections=self.pool_connections
+            )
+            self._http = httpx.AsyncClient(limits=limits)
+        await self.provider.limiter.acquire()
+        primary = asyncio.ensure_future(self._attempt(query))
+        if not self.hedge_ms:
+            return await primary
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_ms / 1000)
+        if done or not self.provider.limiter.try_acquire():
+            return await primary
+        hedge = asyncio.ensure_future(self._attempt(query))
+        return await self._first_success(primary, hedge)
+
+    async def _first_success(self, primary, hedge):
+        pending, error = {primary, hedge}, None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    winner = "primary" if task is primary else "hedge"
+                    metrics.SEARCH_HEDGES.inc(provider=self.provider.name, winner=winner)
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    async def _attempt(self, query):
+        name = self.provider.name
+        started = time.monotonic()
+        try:
+            results = await asyncio.wait_for(
+                self.provider.fetch(self._http, query, self.max_results), self.provider.timeout
+            )
+        except asyncio.CancelledError:
+            metrics.SEARCH_REQUESTS.inc(provider=name, status="cancelled")
+            raise
+        except asyncio.TimeoutError:
+            metrics.SEARCH_REQUESTS.inc(provider=name, status="timeout")
+            raise SearchError(f"{name} search timed out after {self.provider.timeout:g}s")
+        except Exception as e:
+            metrics.SEARCH_REQUESTS.inc(provider=name, status="error")
+            raise SearchError(f"{name} search failed: {e}") from e
+        metrics.SEARCH_REQUESTS.inc(provider=name, status="ok")
+        metrics.SEARCH_LATENCY.observe(time.monotonic() - started, provider=name)
+        return results
+
+    def close(self):
+        async def shutdown():
+            if self._http is not None:
+                await self._http.aclose()
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_search_client():
+    """The shared SearchClient for SEARCH_BACKEND, or None for the placeholder backend."""
+    global _client
+    if SEARCH_BACKEND == "placeholder":
+        return None
+    with _client_lock:
+        if _client is None:
+            if SEARCH_BACKEND not in PROVIDERS:
+                raise SearchError(f"Unknown SEARCH_BACKEND: {SEARCH_BACKEND}")
+            if SEARCH_BACKEND != "fixture" and httpx is None:
+                raise SearchError(f"SEARCH_BACKEND={SEARCH_BACKEND} requires httpx (pip install httpx)")
+            kwargs = {"rate_limit": SEARCH_RATE_LIMIT, "timeout": SEARCH_TIMEOUT}
+            if SEARCH_BACKEND == "fixture":
+                kwargs.update(path=SEARCH_FIXTURES, latency_ms=SEARCH_FIXTURE_LATENCY_MS)
+            _client = SearchClient(PROVIDERS[SEARCH_BACKEND](**kwargs))
+        return _client
+
+
+def close_search_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
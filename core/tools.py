@@ -0,0 +1,94 @@
+"""Parallel execution of the tool calls requested in one model turn."""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import metrics, tracing
+from core.search import execute_web_search
+
+# Process-wide cap on tool calls in flight, and the per-turn (per-phase) cap.
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", "16"))
+TOOL_CONCURRENCY_PER_TURN = int(os.environ.get("TOOL_CONCURRENCY_PER_TURN", "4"))
+
+_pool = ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY, thread_name_prefix="tool")
+
+
+def run_tool(tool_use, destination=None):
+    """Execute a single tool use. Returns (text, status) where status is "success" or "error"."""
+    if tool_use["name"] == "web_search":
+        query = tool_use.get("input", {}).get("query", "")
+        return execute_web_search(query, destination), "success"
+    return f"Unknown tool: {tool_use['name']}", "error"
+
+
+def build_tool_result(tool_use_id, text, status="success"):
+    """Build a toolResult content block for the next user message."""
+    block = {"toolUseId": tool_use_id, "content": [{"text": text}]}
+    if status != "success":
+        block["status"] = status
+    return {"toolResult": block}
+
+
+class ToolExecutor:
+    """
+    Dispatches every tool use from a turn at once and returns the toolResult
+    blocks in the same order as the tool uses.
+
+    on_start(tool_use) and on_finish(tool_use, text, status, duration_ms) are
+    called from worker threads as each call starts and finishes. `destination`
+    is passed to web_search for cache-key normalization.
+    """
+
+    def __init__(self, max_concurrency=None, on_start=None, on_finish=None, destination=None):
+        self.max_concurrency = max(1, max_concurrency or TOOL_CONCURRENCY_PER_TURN)
+        self.destination = destination
+        self.on_start = on_start
+        self.on_finish = on_finish
+
+    def _call(self, tool_use):
+        if self.on_start:
+            self.on_start(tool_use)
+        started = time.monotonic()
+        with tracing.span(tool_use["name"], "tool", input=tool_use.get("input")) as span:
+            try:
+                text, status = run_tool(tool_use, self.destination)
+            except Exception as e:
+                text, status = f"Tool error: {e}", "error"
+            if span is not None:
+                span.set(status=status, result_chars=len(text))
+        elapsed = time.monotonic() - started
+        metrics.TOOL_CALLS.inc(tool=tool_use["name"], status=status)
+        metrics.TOOL_LATENCY.observe(elapsed, tool=tool_use["name"])
+        if self.on_finish:
+            self.on_finish(tool_use, text, status, int(elapsed * 1000))
+        return build_tool_result(tool_use["toolUseId"], text, status)
+
+    def run(self, tool_uses):
+        """Run tool uses concurrently from a blocking caller."""
+        slots = threading.BoundedSemaphore(self.max_concurrency)
+
+        def call(tool_use):
+            try:
+                return self._call(tool_use)
+            finally:
+                slots.release()
+
+        futures = []
+        for tool_use in tool_uses:
+            slots.acquire()
+            futures.append(_pool.submit(tracing.bind(call), tool_use))
+        return [f.result() for f in futures]
+
+    async def arun(self, tool_uses):
+        """Run tool uses concurrently from a coroutine."""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def call(tool_use):
+            async with slots:
+                return await loop.run_in_executor(_pool, tracing.bind(self._call), tool_use)
+
+        return list(await asyncio.gather(*(call(tu) for tu in tool_uses)))
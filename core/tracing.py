@@ -0,0 +1,184 @@
+"""Per-session span tracing, exported in Chrome trace format.
+
+A trace is a bounded ring buffer of spans (session → phase → iteration →
+model / tool call). The current span lives in a context variable, so
+span() nests automatically; code that hands work to a thread pool must run
+it under contextvars.copy_context() to keep the parent. Outside an active
+trace, span() is a no-op, so instrumented code costs next to nothing when
+it is not part of a session.
+
+Load the JSON from Trace.to_chrome() in chrome://tracing or ui.perfetto.dev.
+"""
+
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# Spans kept per session (oldest dropped first); 0 disables tracing
+TRACE_MAX_SPANS = int(os.environ.get("TRACE_MAX_SPANS", "2000"))
+# Sessions whose traces are kept in this process (least recently used dropped first)
+TRACE_MAX_SESSIONS = int(os.environ.get("TRACE_MAX_SESSIONS", "256"))
+
+_current = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "cat", "start", "end", "tid", "args")
+
+    def __init__(self, trace, name, cat, parent_id, start, args):
+        self.trace = trace
+        self.span_id = next(trace._ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.cat = cat
+        self.start = start
+        self.end = None
+        self.tid = threading.get_native_id()
+        self.args = args
+
+    def set(self, **args):
+        """Attach attributes (token counts, stop reason, status, ...) to the span."""
+        self.args.update(args)
+
+
+class Trace:
+    """Spans for one session, capped at max_spans."""
+
+    def __init__(self, trace_id, max_spans=TRACE_MAX_SPANS):
+        self.trace_id = trace_id
+        self.origin = time.monotonic()
+        self.spans = deque(maxlen=max_spans)
+        self.dropped = 0
+        self._ids = itertools.count(1)
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _add(self, span):
+        with self._lock:
+            if len(self.spans) == self.spans.maxlen:
+                self.dropped += 1
+            self.spans.append(span)
+            self._threads.setdefault(span.tid, threading.current_thread().name)
+
+    def record(self, name, cat, start, end=None, parent=None, **args):
+        """
+        Add a span with explicit monotonic start/end times, for intervals
+        measured outside a `with span()` block (queue waits, SSE connections).
+        An end of None leaves the span open until finish() is called.
+        """
+        span = Span(self, name, cat, parent.span_id if parent else None, start, args)
+        span.end = end
+        self._add(span)
+        return span
+
+    def to_chrome(self):
+        """Chrome trace-event JSON. Spans still open are drawn up to now."""
+        now = time.monotonic()
+        with self._lock:
+            spans = list(self.spans)
+            threads = dict(self._threads)
+        events = [{"name": "process_name", "ph": "M", "pid": 1, "args": {"name": f"session {self.trace_id}"}}]
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        )
+        for span in spans:
+            end = span.end if span.end is not None else now
+            args = {**span.args, "span_id": span.span_id, "parent_id": span.parent_id}
+            if span.end is None:
+                args["in_progress"] = True
+            events.append({
+                "name": span.name,
+                "cat": span.cat,
+                "ph": "X",
+                "pid": 1,
+                "tid": span.tid,
+                "ts": round((span.start - self.origin) * 1e6),
+                "dur": round((end - span.start) * 1e6),
+                "args": args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"session_id": self.trace_id, "dropped_spans": self.dropped},
+        }
+
+
+_traces = OrderedDict()
+_traces_lock = threading.Lock()
+
+
+def get_trace(trace_id, create=False):
+    """The trace for a session id, or None. With create=True, start one if missing."""
+    with _traces_lock:
+        trace = _traces.get(trace_id)
+        if trace is None and create and TRACE_MAX_SPANS > 0:
+            trace = _traces[trace_id] = Trace(trace_id)
+            while len(_traces) > TRACE_MAX_SESSIONS:
+                _traces.popitem(last=False)
+        if trace is not None:
+            _traces.move_to_end(trace_id)
+        return trace
+
+
+def current_span():
+    return _current.get()
+
+
+def finish(span):
+    if span is not None and span.end is None:
+        span.end = time.monotonic()
+
+
+@contextmanager
+def _activate(span):
+    token = _current.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set(error=str(e) or type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        finish(span)
+
+
+@contextmanager
+def session_span(trace_id, name, cat="session", **args):
+    """
+    Open a top-level span in a session's trace (creating the trace) and make
+    it current, so span() calls below it are recorded. No-op if tracing is off.
+    """
+    trace = get_trace(trace_id, create=True)
+    if trace is None:
+        yield None
+        return
+    parent = _current.get()
+    parent = parent if parent is not None and parent.trace is trace else None
+    with _activate(trace.record(name, cat, time.monotonic(), parent=parent, **args)) as span:
+        yield span
+
+
+@contextmanager
+def span(name, cat, **args):
+    """Child span of the current span; yields None (and records nothing) outside a trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _activate(parent.trace.record(name, cat, time.monotonic(), parent=parent, **args)) as child:
+        yield child
+
+
+def bind(fn):
+    """
+    Wrap fn to run in a copy of the caller's context, so thread pool work
+    keeps the current span. Bind once per submit; a context cannot be
+    entered by two threads at once.
+    """
+    return functools.partial(contextvars.copy_context().run, fn)
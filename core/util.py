@@ -0,0 +1,33 @@
+"""Small helpers shared by the app and the offline stand-ins (core.fake_bedrock, the fixture search provider)."""
+
+import json
+import math
+
+
+def estimate_tokens(value):
+    """
+    Rough token count (~4 characters per token) for budgeting without a
+    tokenizer. Strings are measured as-is, anything else as its JSON.
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, default=str)
+    return len(value) // 4 + 1
+
+
+def parse_distribution(spec):
+    """
+    Parse "250", "uniform:100,400" or "lognormal:600,2000" (median, p99)
+    into a function rng -> sample.
+    """
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+    a, b = (float(x) for x in params.split(","))
+    if kind == "uniform":
+        return lambda rng: rng.uniform(a, b)
+    if kind == "lognormal":
+        mu = math.log(a)
+        sigma = max(0.0, (math.log(b) - mu) / 2.326)  # z-score of the 99th percentile
+        return lambda rng: rng.lognormvariate(mu, sigma)
+    raise ValueError(f"Unknown distribution: {spec}")
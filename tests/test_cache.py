@@ -0,0 +1,25 @@
+import time
+
+from core import search
+from core.cache import TTLCache
+from core.search_providers import NO_RESULTS
+
+
+def test_expired_sqlite_rows_are_purged_without_being_looked_up(tmp_path):
+    cache = TTLCache("t", db_path=str(tmp_path / "cache.sqlite3"), purge_every=3)
+    cache.set("stale", "x", ttl_seconds=0.01)
+    time.sleep(0.02)
+    cache.set("a", 1)
+    assert cache._db.execute("SELECT COUNT(*) FROM cache_t").fetchone()[0] == 2
+    cache.set("b", 2)
+    assert sorted(row[0] for row in cache._db.execute("SELECT key FROM cache_t")) == ["a", "b"]
+
+
+def test_empty_search_results_get_the_short_ttl(monkeypatch):
+    monkeypatch.setattr(search, "search_cache", TTLCache("search_test"))
+    monkeypatch.setattr(search, "_search_backend", lambda query: NO_RESULTS if "nothing" in query else "hits")
+    search.execute_web_search("nothing here")
+    search.execute_web_search("ferry times")
+    expiry = {key: entry[0] for key, entry in search.search_cache._entries.items()}
+    assert expiry["nothing here"] - time.time() <= search.SEARCH_EMPTY_CACHE_TTL
+    assert expiry["ferry times"] - time.time() > search.SEARCH_EMPTY_CACHE_TTL
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from backend.chat import ChatQueue, ChatQueueFull, question_key
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_question_key_ignores_case_and_whitespace():
+    assert question_key("  Is the  Louvre open on MONDAY? ") == question_key("is the louvre open on monday?")
+
+
+def test_turns_for_a_session_run_one_at_a_time_in_order():
+    async def main():
+        queue = ChatQueue()
+        log = []
+
+        def make(name):
+            async def run(emit):
+                log.append(f"start {name}")
+                await asyncio.sleep(0.01)
+                log.append(f"end {name}")
+                return name
+            return run
+
+        turns = [queue.submit("s", q, make(q))[0] for q in ("one", "two", "three")]
+        assert [turn.position for turn in turns] == [0, 1, 2]
+        assert await asyncio.gather(*(turn.result() for turn in turns)) == ["one", "two", "three"]
+        assert log == ["start one", "end one", "start two", "end two", "start three", "end three"]
+        assert queue.depth("s") == 0
+
+    _run(main())
+
+
+def test_sessions_do_not_wait_for_each_other():
+    async def main():
+        queue = ChatQueue()
+        gate = asyncio.Event()
+
+        async def blocked(emit):
+            await gate.wait()
+            return "a"
+
+        async def quick(emit):
+            return "b"
+
+        first, _ = queue.submit("a", "q", blocked)
+        second, _ = queue.submit("b", "q", quick)
+        assert await asyncio.wait_for(second.result(), 1) == "b"
+        gate.set()
+        assert await first.result() == "a"
+
+    _run(main())
+
+
+def test_identical_pending_question_shares_the_turn():
+    async def main():
+        queue = ChatQueue()
+        calls = 0
+
+        async def run(emit):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        first, shared_first = queue.submit("s", "What to eat?", run)
+        second, shared_second = queue.submit("s", "what  to EAT?", run)
+        assert (shared_first, shared_second) == (False, True)
+        assert second is first
+        assert await second.result() == "answer"
+        assert calls == 1
+
+    _run(main())
+
+
+def test_full_queue_rejects_new_questions_but_still_shares():
+    async def main():
+        queue = ChatQueue(limit=2)
+        gate = asyncio.Event()
+
+        async def run(emit):
+            await gate.wait()
+
+        queue.submit("s", "a", run)
+        queue.submit("s", "b", run)
+        with pytest.raises(ChatQueueFull):
+            queue.submit("s", "c", run)
+        assert queue.submit("s", "b", run)[1] is True
+        await asyncio.sleep(0)
+        assert queue.stats() == {"queued": 1, "running": 1, "sessions": 1}
+        gate.set()
+
+    _run(main())
+
+
+def test_late_subscribers_replay_earlier_events():
+    async def main():
+        queue = ChatQueue()
+        release = asyncio.Event()
+
+        async def run(emit):
+            emit("search", {"query": "x"})
+            await release.wait()
+            emit("delta", {"text": "hi"})
+            return "done"
+
+        turn, _ = queue.submit("s", "q", run)
+        await asyncio.sleep(0.01)
+        seen = []
+        turn.subscribe(seen.append)
+        release.set()
+        await turn.result()
+        await asyncio.sleep(0)
+        assert seen == [("search", {"query": "x"}), ("delta", {"text": "hi"})]
+
+    _run(main())
+
+
+def test_failure_reaches_every_waiter_and_frees_the_slot():
+    async def main():
+        queue = ChatQueue()
+
+        async def run(emit):
+            raise RuntimeError("model unavailable")
+
+        turn, _ = queue.submit("s", "q", run)
+        with pytest.raises(RuntimeError, match="model unavailable"):
+            await turn.result()
+        assert queue.depth("s") == 0
+        assert queue.submit("s", "q", run)[1] is False
+
+    _run(main())
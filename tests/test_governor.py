@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError, EventStreamError
+
+from core.governor import BedrockUnavailable, Governor, classify_error
+
+
+def _error(code, cls=ClientError):
+    return cls({"Error": {"Code": code, "Message": code}}, "Converse")
+
+
+def _governor(**kwargs):
+    defaults = dict(rpm=0, tpm=0, max_concurrency=8, max_retries=3, backoff_base=0.001, backoff_cap=0.001,
+                    breaker_threshold=3, breaker_cooldown=0.05)
+    return Governor(**{**defaults, **kwargs})
+
+
+def _failing(*errors, result=None):
+    """fn that raises the given errors in turn, then returns result; counts calls."""
+    remaining = list(errors)
+
+    def fn():
+        fn.calls += 1
+        if remaining:
+            raise remaining.pop(0)
+        return result if result is not None else {"usage": {"inputTokens": 10, "outputTokens": 5}}
+
+    fn.calls = 0
+    return fn
+
+
+def test_classify_error():
+    assert classify_error(_error("ThrottlingException")) == "throttle"
+    assert classify_error(_error("ServiceUnavailableException")) == "transient"
+    assert classify_error(_error("ValidationException")) == "fatal"
+    assert classify_error(ValueError("bad")) == "fatal"
+
+
+def test_classify_event_stream_errors_with_camel_case_codes():
+    assert classify_error(_error("throttlingException", EventStreamError)) == "throttle"
+    assert classify_error(_error("modelStreamErrorException", EventStreamError)) == "transient"
+
+
+def test_throttles_are_retried_until_success():
+    fn = _failing(_error("ThrottlingException"), _error("InternalServerException"))
+    assert _governor().call(fn, "flights") == {"usage": {"inputTokens": 10, "outputTokens": 5}}
+    assert fn.calls == 3
+
+
+def test_fatal_errors_are_not_retried():
+    fn = _failing(_error("ValidationException"))
+    with pytest.raises(ClientError):
+        _governor().call(fn, "flights")
+    assert fn.calls == 1
+
+
+def test_retries_stop_at_max_retries():
+    fn = _failing(*[_error("ThrottlingException")] * 5)
+    with pytest.raises(ClientError):
+        _governor(max_retries=2).call(fn, "flights")
+    assert fn.calls == 3
+
+
+def test_retryable_false_stops_retries():
+    fn = _failing(_error("ThrottlingException"))
+    with pytest.raises(ClientError):
+        _governor().call(fn, "flights", retryable=lambda: False)
+    assert fn.calls == 1
+
+
+def test_throttle_halves_the_limit_and_successes_grow_it_back():
+    governor = _governor(max_concurrency=8, max_retries=0)
+    with pytest.raises(ClientError):
+        governor.call(_failing(_error("ThrottlingException")), "flights")
+    assert governor.limit == 4
+    for _ in range(4):
+        governor.call(_failing(), "flights")
+    assert 4 < governor.limit <= 5
+
+
+def test_burst_of_throttles_admitted_before_a_decrease_halves_once():
+    governor = _governor(max_concurrency=8, max_retries=0)
+    barrier = threading.Barrier(4)
+
+    def throttled():
+        barrier.wait()
+        raise _error("ThrottlingException")
+
+    def worker():
+        with pytest.raises(ClientError):
+            governor.call(throttled, "flights")
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert governor.limit == 4
+
+
+def test_breaker_opens_after_consecutive_failures_and_a_probe_closes_it():
+    governor = _governor(max_retries=0, breaker_threshold=2)
+    for _ in range(2):
+        with pytest.raises(ClientError):
+            governor.call(_failing(_error("ServiceUnavailableException")), "flights")
+    fn = _failing()
+    with pytest.raises(BedrockUnavailable):
+        governor.call(fn, "flights")
+    assert fn.calls == 0
+    assert governor.stats()["breaker_open"] == 1
+
+    time.sleep(0.06)
+    governor.call(fn, "flights")
+    assert fn.calls == 1
+    assert governor.stats()["breaker_open"] == 0
+
+
+def test_failed_probe_reopens_the_breaker():
+    governor = _governor(max_retries=0, breaker_threshold=1)
+    with pytest.raises(ClientError):
+        governor.call(_failing(_error("ServiceUnavailableException")), "flights")
+    time.sleep(0.06)
+    with pytest.raises(ClientError):
+        governor.call(_failing(_error("throttlingException", EventStreamError)), "flights")
+    with pytest.raises(BedrockUnavailable):
+        governor.call(_failing(), "flights")
+
+
+def test_chat_calls_are_admitted_before_waiting_research_calls():
+    governor = _governor(max_concurrency=1)
+    release = threading.Event()
+    order = []
+
+    def blocking():
+        release.wait()
+        return {}
+
+    def record(name):
+        def fn():
+            order.append(name)
+            return {}
+        return fn
+
+    holder = threading.Thread(target=governor.call, args=(blocking, "flights"))
+    holder.start()
+    while governor.stats()["in_flight"] == 0:
+        time.sleep(0.001)
+    waiters = [
+        threading.Thread(target=governor.call, args=(record("research"), "hotels")),
+        threading.Thread(target=governor.call, args=(record("chat"), "qa")),
+    ]
+    for waiting, waiter in enumerate(waiters, start=1):
+        waiter.start()
+        while governor.stats()["waiting_interactive"] + governor.stats()["waiting_background"] < waiting:
+            time.sleep(0.001)
+    release.set()
+    for thread in [holder, *waiters]:
+        thread.join()
+    assert order == ["chat", "research"]
+
+
+def test_requests_per_minute_are_paced():
+    governor = _governor(rpm=600)  # one request per 0.1s once the initial burst is spent
+    governor._requests.level = 1
+    started = time.monotonic()
+    for _ in range(3):
+        governor.call(_failing(), "flights")
+    assert time.monotonic() - started >= 0.18
@@ -0,0 +1,87 @@
+import pytest
+
+from backend.runner import QueueFull, SessionBusy, submit_preferences_update
+from backend.state import ResearchSession
+from core.phases import PHASES, affected_phases
+from core.research import changed_fields
+
+PREFS = {
+    "destination": "Lisbon", "departing_from": "London", "nationality": "British", "days": 5,
+    "travel_dates": "May", "travelers": "2 adults", "budget": "mid-range", "travel_style": "relaxed",
+    "interests": "food", "special_requirements": "",
+}
+
+
+def test_changed_fields_ignores_case_and_whitespace():
+    assert changed_fields(PREFS, {**PREFS, "destination": "  lisbon ", "interests": "FOOD"}) == []
+
+
+def test_changed_fields_lists_changes_in_field_order():
+    new = {**PREFS, "interests": "museums", "days": 7, "nationality": "Irish"}
+    assert changed_fields(PREFS, new) == ["nationality", "days", "interests"]
+
+
+def test_changed_fields_treats_missing_as_a_change():
+    old = {k: v for k, v in PREFS.items() if k != "budget"}
+    assert changed_fields(old, PREFS) == ["budget"]
+
+
+def test_affected_phases_includes_users_and_dependents():
+    assert affected_phases(["nationality"]) == ["rules", "itinerary"]
+    assert affected_phases(["interests"]) == ["hotels", "itinerary"]
+    assert "rules" in affected_phases(["travel_dates"])
+    assert affected_phases(["destination"]) == [phase["id"] for phase in PHASES]
+    assert affected_phases([]) == []
+
+
+def test_affected_phases_follows_dependencies_transitively():
+    phases = [
+        {"id": "a", "depends_on": [], "uses": ["x"]},
+        {"id": "b", "depends_on": ["a"], "uses": []},
+        {"id": "c", "depends_on": ["b"], "uses": []},
+        {"id": "d", "depends_on": [], "uses": ["y"]},
+    ]
+    assert affected_phases(["x"], phases) == ["a", "b", "c"]
+
+
+def test_update_without_affected_phases_keeps_results():
+    session = ResearchSession(session_id="s", prefs=dict(PREFS), results={"rules": "r"}, status="complete")
+    summary = submit_preferences_update(session, {**PREFS, "destination": "LISBON"})
+    assert summary["rerun"] == []
+    assert session.results == {"rules": "r"}
+    assert session.status == "complete"
+
+
+@pytest.mark.parametrize("status", ["queued", "running"])
+def test_update_while_research_is_in_progress_is_refused(status):
+    session = ResearchSession(session_id="s", prefs=dict(PREFS), status=status)
+    with pytest.raises(SessionBusy):
+        submit_preferences_update(session, {**PREFS, "days": 9})
+
+
+def test_update_marks_session_queued_before_submitting(monkeypatch):
+    seen = []
+    monkeypatch.setattr("backend.runner.submit_research", lambda s, client_id="": seen.append(s.status) or 2)
+    session = ResearchSession(
+        session_id="s", prefs=dict(PREFS), results={"rules": "r", "flights": "f"}, status="complete"
+    )
+    summary = submit_preferences_update(session, {**PREFS, "nationality": "Irish"})
+    assert seen == ["queued"]
+    assert summary["rerun"] == ["rules", "itinerary"]
+    assert summary["queue_position"] == 2
+    assert session.results == {"flights": "f"}
+
+
+def test_queue_full_rolls_back_only_its_own_event(monkeypatch):
+    def queue_full(session, client_id=""):
+        raise QueueFull(5)
+
+    monkeypatch.setattr("backend.runner.submit_research", queue_full)
+    session = ResearchSession(session_id="s", prefs=dict(PREFS), results={"rules": "r"}, status="complete")
+    earlier = session.events.publish("preferences_updated", {"rerun": ["rules", "itinerary"]})
+    with pytest.raises(QueueFull):
+        submit_preferences_update(session, {**PREFS, "nationality": "Irish"})
+    assert [e[0] for e in session.events.since(0)] == [earlier]
+    assert session.prefs == PREFS
+    assert session.results == {"rules": "r"}
+    assert session.status == "complete"
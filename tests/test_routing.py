@@ -0,0 +1,39 @@
+import pytest
+
+from core.routing import ModelRouter, parse_routes
+
+
+def test_parse_routes():
+    assert parse_routes(" qa:compile=large, itinerary=my-model ,*:digest=fast,") == {
+        ("qa", "compile"): "large",
+        ("itinerary", "*"): "my-model",
+        ("*", "digest"): "fast",
+    }
+    with pytest.raises(ValueError):
+        parse_routes("qa:compile=")
+
+
+def test_default_routes_send_search_and_chat_to_the_fast_model():
+    router = ModelRouter(large="big", fast="small", routes="")
+    assert router.model_for("flights", "search") == "small"
+    assert router.model_for("flights", "compile") == "big"
+    assert router.model_for("flights_digest", "digest") == "small"
+    assert router.model_for("qa_summary", "summary") == "small"
+    assert router.model_for("qa", "compile") == "small"
+    assert router.escalates("flights")
+    assert not router.escalates("qa")
+
+
+def test_most_specific_route_wins():
+    router = ModelRouter(large="big", fast="small", routes="qa:compile=large,itinerary:*=large,*:search=custom-id")
+    assert router.model_for("qa", "compile") == "big"
+    assert router.model_for("qa", "search") == "small"
+    assert router.model_for("itinerary", "search") == "big"
+    assert router.model_for("hotels", "search") == "custom-id"
+    assert not router.escalates("itinerary")
+
+
+def test_without_a_fast_model_nothing_escalates():
+    router = ModelRouter(large="big", fast="big", routes="")
+    assert {router.model_for("flights", role) for role in ("search", "compile", "digest")} == {"big"}
+    assert not router.escalates("flights")
@@ -0,0 +1,35 @@
+import pytest
+
+from core import save
+from core.save import plan_filename, render_html
+
+PREFS = {"destination": "Oslo <script>", "days": 3}
+HOSTILE = (
+    "# Hotels\n\n<script>alert(1)</script> <img src=x onerror=alert(2)>\n\n"
+    "[book](javascript:alert(3)) [tab](jav&#x61;script:alert(4)) ![p](data:text/html,hi)\n\n"
+    "[ok](https://example.com/a?b=1&c=2) [mail](mailto:a@example.com) [rel](/path)\n"
+)
+
+
+@pytest.mark.parametrize("with_markdown", [True, False])
+def test_html_export_escapes_raw_html_and_unsafe_links(monkeypatch, with_markdown):
+    if with_markdown:
+        pytest.importorskip("markdown")
+    else:
+        monkeypatch.setattr(save, "markdown_lib", None)
+    page = render_html({"hotels": HOSTILE}, PREFS)
+    body = page.split("<body>", 1)[1]
+    assert "<script" not in page
+    assert "<img src=x" not in body
+    if with_markdown:
+        assert "javascript" not in body
+        assert body.count('href="#"') == 2
+        assert '<img alt="p" src="#"' in body
+        assert "data:text/html" not in body
+        assert 'href="https://example.com/a?b=1&amp;c=2"' in body
+        assert 'href="mailto:a@example.com"' in body
+        assert 'href="/path"' in body
+
+
+def test_plan_filename_is_stable_for_a_version():
+    assert plan_filename({"destination": "New York, NY"}, "html", 7) == "trip_new_york_ny_v7.html"
@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from core.scheduler import run_phase_graph, validate_phase_graph
+
+
+def _phase(phase_id, *depends_on):
+    return {"id": phase_id, "depends_on": list(depends_on)}
+
+
+def test_dependencies_finish_before_dependents():
+    phases = [_phase("a"), _phase("b"), _phase("c", "a", "b"), _phase("d", "c")]
+    finished = []
+    lock = threading.Lock()
+
+    def run_one(phase):
+        with lock:
+            assert set(phase["depends_on"]) <= set(finished)
+        time.sleep(0.01)
+        with lock:
+            finished.append(phase["id"])
+
+    run_phase_graph(phases, run_one, max_concurrency=4)
+    assert sorted(finished) == ["a", "b", "c", "d"]
+    assert finished.index("c") > max(finished.index("a"), finished.index("b"))
+
+
+def test_independent_phases_run_concurrently_up_to_the_cap():
+    active = peak = 0
+    lock = threading.Lock()
+
+    def run_one(phase):
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    run_phase_graph([_phase(str(i)) for i in range(6)], run_one, max_concurrency=3)
+    assert peak == 3
+
+
+def test_failed_phase_still_releases_dependents_and_is_reraised():
+    ran = []
+
+    def run_one(phase):
+        ran.append(phase["id"])
+        if phase["id"] == "a":
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        run_phase_graph([_phase("a"), _phase("b", "a")], run_one, max_concurrency=1)
+    assert ran == ["a", "b"]
+
+
+def test_validate_rejects_unknown_dependencies_and_cycles():
+    with pytest.raises(ValueError, match="unknown phase"):
+        validate_phase_graph([_phase("a", "missing")])
+    with pytest.raises(ValueError, match="cycle"):
+        validate_phase_graph([_phase("a", "b"), _phase("b", "a")])
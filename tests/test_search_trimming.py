@@ -0,0 +1,45 @@
+from core.search_providers import clean_text, trim_results
+
+
+def _result(url, content, title="Title"):
+    return {"title": title, "url": url, "content": content}
+
+
+def test_clean_text_strips_markup_entities_and_links():
+    text = "<p>Fares&nbsp;from <b>£40</b></p><script>track()</script> see [the site](https://x.example)\n\n now"
+    assert clean_text(text) == "Fares from £40 see the site now"
+
+
+def test_duplicate_urls_and_near_empty_results_are_dropped():
+    body = "Trains run every ten minutes between the airport and the city centre."
+    text = trim_results([
+        _result("https://a.example/page", body),
+        _result("https://a.example/page/#section", body + " Again."),
+        _result("https://b.example", "Too short."),
+        _result("https://c.example", body, title="Third"),
+    ])
+    assert text.count("https://a.example/page") == 1
+    assert "b.example" not in text
+    assert text.startswith("[1] Title\nhttps://a.example/page\n")
+    assert "[2] Third\nhttps://c.example\n" in text
+
+
+def test_output_stays_within_the_token_budget():
+    long_text = " ".join(f"Sentence number {i} about hotel prices." for i in range(400))
+    results = [_result(f"https://{i}.example", long_text) for i in range(5)]
+    for budget in (200, 600, 1200):
+        assert len(trim_results(results, token_budget=budget)) <= budget * 4
+
+
+def test_short_results_leave_their_share_to_long_ones():
+    short = "A short but useful snippet about the museum opening hours today."
+    long_text = "Long guide. " * 500
+    text = trim_results([_result("https://s.example", short), _result("https://l.example", long_text)], 300)
+    assert short in text
+    long_part = text.split("https://l.example\n", 1)[1]
+    assert len(long_part) > 300 * 4 // 2
+
+
+def test_no_usable_results():
+    assert trim_results([]) == "No results found."
+    assert trim_results([_result("https://x.example", "<br>")]) == "No results found."
@@ -0,0 +1,33 @@
+import pytest
+
+from backend.state import ResearchSession, SessionStore
+from backend.stores.sqlite import SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return SessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+
+
+def test_only_one_copy_of_a_session_can_be_marked_queued(store):
+    store["s"] = ResearchSession(session_id="s", prefs={}, status="complete")
+    # Two API processes each load their own copy (the memory store shares one object)
+    first, second = store["s"], store["s"]
+    assert store.try_mark_queued(first)
+    assert not store.try_mark_queued(second)
+    assert store["s"].status == "queued"
+
+
+def test_sqlite_event_ids_are_not_reused_after_removing_the_newest(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    store["s"] = ResearchSession(session_id="s", prefs={}, status="complete")
+    events = store["s"].events
+    events.publish("a", {})
+    newest = events.publish("b", {})
+    events.discard(newest)
+    assert events.publish("c", {}) == newest + 1
+    events.drop(lambda event_type, data: event_type == "c")
+    assert events.last_id == newest + 1
+    assert events.publish("d", {}) == newest + 2